@@ -0,0 +1,69 @@
+"""
+Inventory index filters.
+
+Templates that loop over groups['...'] and look up hostvars[host] for every host
+do O(N) variable resolution per render, so rendering them on every node costs
+O(N^2) across the fleet. These filters build the group and address maps once
+(set_fact with run_once) so templates only iterate plain dicts and lists.
+
+    inventory_index: "{{ groups | inventory_index(hostvars) }}"
+
+    {
+      'groups':    {'app_servers': ['app-node', ...], ...},   # sorted, 'all' and 'ungrouped' included
+      'members':   {'app_servers': {'app-node': True}, ...},  # O(1) membership tests
+      'addresses': {'app-node': '192.168.56.11', ...},        # first defined address key
+    }
+"""
+
+DEFAULT_ADDRESS_KEYS = ('internal_ip', 'ansible_host')
+
+
+def inventory_index(groups, hostvars, address_keys=DEFAULT_ADDRESS_KEYS):
+    """Build group -> hosts, group -> membership and host -> address maps in one pass."""
+    if isinstance(address_keys, str):
+        address_keys = [address_keys]
+    index_groups = {}
+    members = {}
+    for group, hosts in groups.items():
+        index_groups[group] = sorted(hosts)
+        members[group] = dict.fromkeys(hosts, True)
+
+    addresses = {}
+    for host in index_groups.get('all', sorted({h for hosts in groups.values() for h in hosts})):
+        host_vars = hostvars[host]
+        address = None
+        for key in address_keys:
+            if key in host_vars and host_vars[key]:
+                address = host_vars[key]
+                break
+        addresses[host] = address if address is not None else host
+    return {'groups': index_groups, 'members': members, 'addresses': addresses}
+
+
+def scrape_targets(index, group, port):
+    """Return ['address:port', ...] for the hosts of a group (empty if the group does not exist)."""
+    addresses = index['addresses']
+    return [f"{addresses[host]}:{port}" for host in index['groups'].get(group, [])]
+
+
+def shard_targets(targets, shard_size):
+    """
+    Split targets into consecutive chunks of at most shard_size.
+
+    Always returns at least one (possibly empty) chunk so a scrape job is still
+    rendered for an empty group. A shard_size of 0 disables sharding.
+    """
+    targets = list(targets)
+    shard_size = int(shard_size)
+    if shard_size <= 0 or len(targets) <= shard_size:
+        return [targets]
+    return [targets[i:i + shard_size] for i in range(0, len(targets), shard_size)]
+
+
+class FilterModule(object):
+    def filters(self):
+        return {
+            'inventory_index': inventory_index,
+            'scrape_targets': scrape_targets,
+            'shard_targets': shard_targets,
+        }
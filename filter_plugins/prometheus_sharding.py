@@ -0,0 +1,78 @@
+"""
+Prometheus scrape sharding filters.
+
+Every shard applies the same 'hashmod' relabel step to a target's __address__,
+placing it in one of a fixed number of hash slots, and keeps only the targets
+whose slot it owns. Slots are assigned to monitoring hosts by rendezvous
+(highest random weight) hashing with bounded loads: each slot goes to the
+highest-ranked host that has fewer than ceil(slots / hosts) slots. The slot ->
+host map depends only on the set of hosts, every host owns the same number of
+slots (+-1), adding a monitoring host moves little more than the 1/N share it
+takes over, and adding targets never moves existing ones.
+
+    relabel_configs:
+      - source_labels: [__address__]
+        modulus: "{{ prometheus_shard_slots }}"
+        target_label: __tmp_hashmod
+        action: hashmod
+      - source_labels: [__tmp_hashmod]
+        regex: "{{ prometheus_shard_hosts | shard_slots(inventory_hostname, prometheus_shard_slots) | join('|') }}"
+        action: keep
+"""
+import hashlib
+import math
+
+try:
+    from ansible.errors import AnsibleFilterError
+except ImportError:  # Imported outside Ansible (unit tests, scripts)
+    AnsibleFilterError = ValueError
+
+
+def hashmod(value, modulus):
+    """Return the slot Prometheus' hashmod relabel action assigns to value (md5, low 64 bits, mod modulus)."""
+    digest = hashlib.md5(str(value).encode('utf-8')).digest()
+    return int.from_bytes(digest[8:], 'big') % int(modulus)
+
+
+def _rank(hosts, slot):
+    return sorted(hosts, key=lambda host: hashlib.md5(f"{host}/{slot}".encode('utf-8')).digest(), reverse=True)
+
+
+def slot_owners(hosts, slots):
+    """Return [owner host of slot 0, owner of slot 1, ...] for the given shard hosts."""
+    hosts = sorted(set(hosts))
+    slots = int(slots)
+    if not hosts:
+        raise AnsibleFilterError("at least one shard host is required")
+    if slots < len(hosts):
+        raise AnsibleFilterError(f"{slots} hash slots cannot be spread over {len(hosts)} shard hosts")
+    capacity = math.ceil(slots / len(hosts))
+    load = dict.fromkeys(hosts, 0)
+    owners = []
+    for slot in range(slots):
+        owner = next(host for host in _rank(hosts, slot) if load[host] < capacity)
+        load[owner] += 1
+        owners.append(owner)
+    return owners
+
+
+def shard_slots(hosts, host, slots):
+    """Return the sorted hash slots owned by host."""
+    if host not in hosts:
+        raise AnsibleFilterError(f"{host} is not one of the shard hosts {sorted(hosts)}")
+    return [slot for slot, owner in enumerate(slot_owners(hosts, slots)) if owner == host]
+
+
+def shard_assignment(targets, hosts, slots):
+    """Return {target: shard host} for the given scrape target addresses."""
+    owners = slot_owners(hosts, slots)
+    return {target: owners[hashmod(target, slots)] for target in targets}
+
+
+class FilterModule(object):
+    def filters(self):
+        return {
+            'hashmod': hashmod,
+            'shard_slots': shard_slots,
+            'shard_assignment': shard_assignment,
+        }
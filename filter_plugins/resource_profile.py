@@ -0,0 +1,151 @@
+"""
+systemd resource profile filter.
+
+Renders a role's resource profile into [Service] directives and refuses
+inconsistent combinations, so a bad override fails the play instead of
+producing a unit that is throttled or OOM-killed at runtime:
+
+    {% for directive in prometheus_resource_profile | systemd_resource_directives %}
+    {{ directive }}
+    {% endfor %}
+
+    cpu_count: "{{ prometheus_cpu_affinity | cpu_count }}"   # CPUs named by an affinity list
+
+Profile keys (None, '' or [] leaves a control unset):
+    memory_max, memory_high   systemd sizes: bytes or K/M/G/T suffix (base 1024), or 'infinity'
+    cpu_quota                 percent of one CPU (200 = two CPUs)
+    cpu_affinity              list of CPU indexes or a systemd CPU list such as '0-1 3'
+    nice                      -20..19
+    io_weight                 1..10000 (systemd default 100)
+    limit_nofile              open file limit
+    gomaxprocs                GOMAXPROCS for Go services
+    gomemlimit                GOMEMLIMIT for Go services: bytes or B/KiB/MiB/GiB/TiB suffix
+
+Consistency checks:
+    memory_high <= memory_max
+    gomemlimit  <  memory_high and memory_max (the GC must react before the kernel does)
+    gomaxprocs  <= CPUs allowed by cpu_quota and cpu_affinity
+"""
+import math
+import re
+
+try:
+    from ansible.errors import AnsibleFilterError
+except ImportError:  # Imported outside Ansible (unit tests, scripts)
+    AnsibleFilterError = ValueError
+
+_SYSTEMD_SIZE_RE = re.compile(r'^(\d+(?:\.\d+)?)\s*([KMGT]?)$', re.IGNORECASE)
+_SYSTEMD_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+_GO_SIZE_RE = re.compile(r'^(\d+)(B|KiB|MiB|GiB|TiB)?$')
+_GO_UNITS = {None: 1, 'B': 1, 'KiB': 1024, 'MiB': 1024 ** 2, 'GiB': 1024 ** 3, 'TiB': 1024 ** 4}
+
+
+def _unset(value):
+    if isinstance(value, str):
+        return not value.strip()
+    return value is None or value == []
+
+
+def parse_systemd_size(value):
+    """Return a systemd memory size in bytes (math.inf for 'infinity')."""
+    text = str(value).strip()
+    if text.lower() == 'infinity':
+        return math.inf
+    match = _SYSTEMD_SIZE_RE.match(text)
+    if match is None:
+        raise AnsibleFilterError(f"invalid systemd memory size {value!r}")
+    return int(float(match.group(1)) * _SYSTEMD_UNITS[match.group(2).upper()])
+
+
+def parse_go_size(value):
+    """Return a GOMEMLIMIT value in bytes."""
+    match = _GO_SIZE_RE.match(str(value).strip())
+    if match is None:
+        raise AnsibleFilterError(f"invalid GOMEMLIMIT {value!r} (expected e.g. 400MiB)")
+    return int(match.group(1)) * _GO_UNITS[match.group(2)]
+
+
+def _parse_cpu_list(value):
+    """Return (systemd CPUAffinity string, number of CPUs)."""
+    if isinstance(value, (list, tuple)):
+        cpus = {int(cpu) for cpu in value}
+        return ' '.join(str(cpu) for cpu in sorted(cpus)), len(cpus)
+    cpus = set()
+    for part in re.split(r'[\s,]+', str(value).strip()):
+        if '-' in part:
+            low, high = part.split('-', 1)
+            cpus.update(range(int(low), int(high) + 1))
+        elif part:
+            cpus.add(int(part))
+    return str(value).strip(), len(cpus)
+
+
+def cpu_count(value):
+    """Return the number of CPUs in a cpu_affinity value (list of indexes or systemd CPU list)."""
+    return _parse_cpu_list(value)[1]
+
+
+def _int(profile, key, low, high=None):
+    try:
+        value = int(profile[key])
+    except (TypeError, ValueError):
+        raise AnsibleFilterError(f"{key} must be an integer, got {profile[key]!r}")
+    if high is None and value < low:
+        raise AnsibleFilterError(f"{key}={value} must be at least {low}")
+    if high is not None and not low <= value <= high:
+        raise AnsibleFilterError(f"{key}={value} is outside {low}..{high}")
+    return value
+
+
+def systemd_resource_directives(profile):
+    """Return the [Service] directive lines for a resource profile."""
+    profile = {key: value for key, value in (profile or {}).items() if not _unset(value)}
+    directives = []
+    memory_limits = []
+
+    for key, directive in (('memory_high', 'MemoryHigh'), ('memory_max', 'MemoryMax')):
+        if key in profile:
+            directives.append(f"{directive}={profile[key]}")
+            memory_limits.append((f"{directive}={profile[key]}", parse_systemd_size(profile[key])))
+    if len(memory_limits) == 2 and memory_limits[0][1] > memory_limits[1][1]:
+        raise AnsibleFilterError(f"{memory_limits[0][0]} is above {memory_limits[1][0]}")
+
+    cpu_limit = math.inf
+    if 'cpu_quota' in profile:
+        cpu_quota = _int(profile, 'cpu_quota', low=1)
+        directives.append(f"CPUQuota={cpu_quota}%")
+        cpu_limit = math.ceil(cpu_quota / 100)
+    if 'cpu_affinity' in profile:
+        affinity, cpu_count = _parse_cpu_list(profile['cpu_affinity'])
+        if cpu_count == 0:
+            raise AnsibleFilterError("cpu_affinity must name at least one CPU")
+        directives.append(f"CPUAffinity={affinity}")
+        cpu_limit = min(cpu_limit, cpu_count)
+    if 'nice' in profile:
+        directives.append(f"Nice={_int(profile, 'nice', low=-20, high=19)}")
+    if 'io_weight' in profile:
+        directives.append(f"IOWeight={_int(profile, 'io_weight', low=1, high=10000)}")
+    if 'limit_nofile' in profile:
+        directives.append(f"LimitNOFILE={_int(profile, 'limit_nofile', low=1)}")
+
+    if 'gomaxprocs' in profile:
+        gomaxprocs = _int(profile, 'gomaxprocs', low=1)
+        if gomaxprocs > cpu_limit:
+            raise AnsibleFilterError(
+                f"GOMAXPROCS={gomaxprocs} exceeds the {cpu_limit} CPU(s) allowed by CPUQuota/CPUAffinity")
+        directives.append(f"Environment=GOMAXPROCS={gomaxprocs}")
+    if 'gomemlimit' in profile:
+        gomemlimit = parse_go_size(profile['gomemlimit'])
+        for limit_directive, limit in memory_limits:
+            if gomemlimit >= limit:
+                raise AnsibleFilterError(f"GOMEMLIMIT={profile['gomemlimit']} must be below {limit_directive}")
+        directives.append(f"Environment=GOMEMLIMIT={profile['gomemlimit']}")
+    return directives
+
+
+class FilterModule(object):
+    def filters(self):
+        return {
+            'systemd_resource_directives': systemd_resource_directives,
+            'cpu_count': cpu_count,
+        }
@@ -1,30 +1,109 @@
 #!/usr/bin/env python3
 
-import http.server
+# Startup-optimized: only what is needed to accept connections is imported here.
+# json, datetime and the debug/workload modules load on first use, logging is
+# configured in main() (importing this module opens no files), and the stdlib
+# request handler (http.server, which pulls in email, http.client and ssl) is
+# imported by the first request.
 import socketserver
-import json
 import time
 import os
+import signal
+import socket
+import sys
+import threading
 import logging
-from datetime import datetime
 
-# Get log file from environment variable or use default
-log_file = os.environ.get('MOCK_SERVICE_LOG_FILE', '/var/log/mock-service.log')
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    
-    handlers=[
-        logging.StreamHandler(),  # Console output
-        logging.FileHandler(log_file)  # File output
-    ]
-)
 logger = logging.getLogger('mock-service')
 
-class MockHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
+# Debug listener (mock_service_debug), started on demand; None while disabled
+debug_server = None
+
+# Synthetic workload routes (mock_service_workload); None unless MOCK_SERVICE_WORKLOAD_FILE is set
+workload = None
+
+# First file descriptor passed by systemd socket activation (sd_listen_fds)
+SD_LISTEN_FDS_START = 3
+
+# Set by the SIGTERM/SIGHUP handlers: 'terminate' drains and exits, 'reexec' drains and re-executes
+stop_reason = None
+
+# The running MockHTTPServer; a stop requested before it exists is only recorded in stop_reason
+server = None
+
+
+def configure_logging():
+    """Log to the console and to MOCK_SERVICE_LOG_FILE."""
+    # Get log file from environment variable or use default
+    log_file = os.environ.get('MOCK_SERVICE_LOG_FILE', '/var/log/mock-service.log')
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+
+        handlers=[
+            logging.StreamHandler(),  # Console output
+            logging.FileHandler(log_file)  # File output
+        ]
+    )
+
+
+def now_iso():
+    """Local time in ISO 8601; datetime is imported by the first response, not at startup."""
+    from datetime import datetime
+    return datetime.now().isoformat()
+
+
+def dumps(value, **kwargs):
+    """json.dumps; json is imported by the first response, not at startup."""
+    import json
+    return json.dumps(value, **kwargs)
+
+
+def start_debug_server():
+    """Start the /debug listener if it is not running yet."""
+    global debug_server
+    if debug_server is None:
+        import mock_service_debug  # Only loaded when the debug surface is used
+        host = os.environ.get('MOCK_SERVICE_DEBUG_ADDRESS', '127.0.0.1')
+        port = int(os.environ.get('MOCK_SERVICE_DEBUG_PORT', 6060))
+        debug_server = mock_service_debug.start(host, port)
+    return debug_server
+
+
+def handle_sigusr1(signum, frame):
+    """Enable the debug surface on a running instance without a restart."""
+    try:
+        start_debug_server()
+    except OSError as e:
+        logger.error(f"Could not start debug listener: {e}")
+
+
+def load_workload(path):
+    """Load the workload route spec that is served ahead of the built-in endpoints."""
+    global workload
+    import mock_service_workload  # Only loaded when a workload spec is configured
+    workload = mock_service_workload.Workload.from_file(path)
+    logger.info(f"Loaded {len(workload.routes)} workload route(s) from {path}")
+    return workload
+
+
+class MockRequestHandlerMixin:
+    """
+    The service's endpoints. Combined with http.server.BaseHTTPRequestHandler by
+    handler_class(), so http.server (and with it email, http.client and ssl) is
+    imported by the first request rather than at startup.
+    """
+    __slots__ = ()
+
+    server_version = 'MockService/1.0'
+    # Seconds a client may stay silent before its connection is dropped (BaseHTTPRequestHandler has no limit)
+    timeout = 30
+
     def do_GET(self):
         """Handle GET requests"""
+        if workload is not None and workload.serve(self):
+            return
         if self.path == '/':
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
@@ -33,7 +112,7 @@ class MockHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
             response = {
                 'service': 'mock-service',
                 'status': 'running',
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': now_iso(),
                 'uptime': time.time(),
                 'version': '1.0.0',
                 'endpoints': {
@@ -43,7 +122,7 @@ class MockHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
                 }
             }
             
-            self.wfile.write(json.dumps(response, indent=2).encode())
+            self.wfile.write(dumps(response, indent=2).encode())
             logger.info(f"GET / - Service info requested from {self.client_address[0]}")
             
         elif self.path == '/health':
@@ -53,10 +132,10 @@ class MockHTTPRequestHandler(http.server.BaseHTTPRequestHandler):
             
             response = {
                 'status': 'healthy',
-                'timestamp': datetime.now().isoformat()
+                'timestamp': now_iso()
             }
             
-            self.wfile.write(json.dumps(response).encode())
+            self.wfile.write(dumps(response).encode())
             logger.info(f"GET /health - Health check from {self.client_address[0]}")
             
         elif self.path == '/metrics':
@@ -77,6 +156,11 @@ mock_service_uptime_seconds {time.time()}
 # TYPE mock_service_info gauge
 mock_service_info{{version="1.0.0",service="mock-service"}} 1
 """
+            if debug_server is not None:
+                import mock_service_debug
+                metrics += "\n" + mock_service_debug.gc_metrics()
+            if workload is not None:
+                metrics += "\n" + workload.metrics()
             self.wfile.write(metrics.encode())
             logger.debug(f"GET /metrics - Metrics requested from {self.client_address[0]}")
             
@@ -88,49 +172,199 @@ mock_service_info{{version="1.0.0",service="mock-service"}} 1
             response = {
                 'error': 'Not found',
                 'path': self.path,
-                'timestamp': datetime.now().isoformat()
+                'timestamp': now_iso()
             }
             
-            self.wfile.write(json.dumps(response).encode())
+            self.wfile.write(dumps(response).encode())
             logger.warning(f"GET {self.path} - 404 Not Found from {self.client_address[0]}")
 
     def do_POST(self):
         """Handle POST requests"""
+        if workload is not None and workload.serve(self):
+            return
         self.send_response(200)
         self.send_header('Content-type', 'application/json')
         self.end_headers()
         
         response = {
             'message': 'POST request received',
-            'timestamp': datetime.now().isoformat()
+            'timestamp': now_iso()
         }
         
-        self.wfile.write(json.dumps(response).encode())
+        self.wfile.write(dumps(response).encode())
         logger.info(f"POST / - Echo request from {self.client_address[0]}")
 
     def log_message(self, format, *args):
         """Override to use logging instead of print"""
         logger.info(f"HTTP: {format % args}")
 
+
+_handler_class = None
+_handler_class_lock = threading.Lock()
+
+
+def handler_class():
+    """Return MockHTTPRequestHandler, importing http.server on first use."""
+    global _handler_class
+    with _handler_class_lock:
+        if _handler_class is None:
+            from http.server import BaseHTTPRequestHandler
+            _handler_class = type('MockHTTPRequestHandler', (MockRequestHandlerMixin, BaseHTTPRequestHandler),
+                                  {'__module__': __name__})
+        return _handler_class
+
+
+def __getattr__(name):
+    # mock_service.MockHTTPRequestHandler still works, without importing http.server at import time
+    if name == 'MockHTTPRequestHandler':
+        return handler_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class MockHTTPServer(socketserver.ThreadingTCPServer):
+    """
+    Threaded, so slow workload routes do not hold up /health and /metrics.
+    Counts in-flight requests so shutdown can drain them, and can adopt an
+    already listening socket (systemd socket activation or a re-exec).
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, server_address, listen_fd=None):
+        # The handler class is resolved per request (finish_request), so binding imports no http.server
+        super().__init__(server_address, None, bind_and_activate=listen_fd is None)
+        if listen_fd is not None:
+            self.socket.close()
+            self.socket = socket.socket(fileno=listen_fd)
+            self.server_address = self.socket.getsockname()
+        self.in_flight = 0
+        self._idle = threading.Condition()
+
+    def finish_request(self, request, client_address):
+        handler_class()(request, client_address, self)
+
+    def process_request(self, request, client_address):
+        with self._idle:
+            self.in_flight += 1
+        super().process_request(request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            with self._idle:
+                self.in_flight -= 1
+                self._idle.notify_all()
+
+    def drain(self, timeout):
+        """Wait up to `timeout` seconds for in-flight requests; return how many are still running."""
+        with self._idle:
+            self._idle.wait_for(lambda: self.in_flight == 0, timeout)
+            return self.in_flight
+
+
+def inherited_listen_fd():
+    """Return the listening socket passed by systemd (or by a previous re-exec), if any."""
+    if os.environ.get('LISTEN_PID') != str(os.getpid()):
+        return None
+    if int(os.environ.get('LISTEN_FDS', 0)) < 1:
+        return None
+    return SD_LISTEN_FDS_START
+
+
+def request_stop(reason):
+    """Return a signal handler that stops accepting connections; main() then drains."""
+    def handler(signum, frame):
+        global stop_reason
+        if stop_reason is None:
+            stop_reason = reason
+            logger.info(f"Received {signal.Signals(signum).name}, draining in-flight requests")
+            if server is not None:
+                # shutdown() waits for serve_forever(), which runs in this (the main) thread
+                threading.Thread(target=server.shutdown, daemon=True).start()
+    return handler
+
+
+def reexec_argv():
+    """
+    The command line this process was started with, as far as the unit sets it: the script
+    path, or -m and the module name in startup-optimized mode, keeping -s. Rebuilt rather
+    than read from sys.orig_argv, which older interpreters do not have.
+    """
+    argv = [sys.executable]
+    if sys.flags.no_user_site:
+        argv.append('-s')
+    spec = getattr(sys.modules['__main__'], '__spec__', None)
+    if spec is not None:
+        argv += ['-m', spec.name]
+    else:
+        argv.append(sys.argv[0])
+    return argv + sys.argv[1:]
+
+
+def reexec(httpd):
+    """Replace the process image, handing the listening socket over on fd 3 the way systemd does."""
+    logger.info("Re-executing mock service")
+    logging.shutdown()
+    listen_fd = httpd.socket.fileno()
+    if listen_fd != SD_LISTEN_FDS_START:
+        os.dup2(listen_fd, SD_LISTEN_FDS_START)
+    os.set_inheritable(SD_LISTEN_FDS_START, True)
+    os.environ['LISTEN_PID'] = str(os.getpid())
+    os.environ['LISTEN_FDS'] = '1'
+    os.environ.pop('LISTEN_FDNAMES', None)
+    # Ignored signals stay ignored across exec: a reload sent while the new image starts up
+    # is dropped (it already runs the new code) instead of killing it. main() installs the handler.
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    os.execv(sys.executable, reexec_argv())
+
+
 """
 Simple Mock HTTP Service
 Simulates a basic web service for testing and monitoring purposes.
 """
 def main():
     """Main function to start the server"""
+    global server
+    # First, so a reload or stop during startup is not fatal (SIGHUP's default action exits)
+    signal.signal(signal.SIGTERM, request_stop('terminate'))
+    signal.signal(signal.SIGHUP, request_stop('reexec'))
     # Get port from environment variable or use default
     PORT = int(os.environ.get('MOCK_SERVICE_PORT', 8080))
-    HOST = '0.0.0.0'
+    HOST = os.environ.get('MOCK_SERVICE_BIND_ADDRESS', '0.0.0.0')
+    DRAIN_SECONDS = float(os.environ.get('MOCK_SERVICE_DRAIN_SECONDS', 10))
+    configure_logging()
+    
+    if os.environ.get('MOCK_SERVICE_DEBUG', '0').lower() in ('1', 'true', 'yes', 'on'):
+        start_debug_server()
+    signal.signal(signal.SIGUSR1, handle_sigusr1)
     
     try:
-        with socketserver.TCPServer((HOST, PORT), MockHTTPRequestHandler) as httpd:
-            logger.info(f"Mock service starting on {HOST}:{PORT}")
+        if os.environ.get('MOCK_SERVICE_WORKLOAD_FILE'):
+            load_workload(os.environ['MOCK_SERVICE_WORKLOAD_FILE'])
+        listen_fd = inherited_listen_fd()
+        with MockHTTPServer((HOST, PORT), listen_fd) as httpd:
+            server = httpd
+            host, port = httpd.server_address[:2]
+            activation = ' (inherited socket)' if listen_fd is not None else ''
+            logger.info(f"Mock service starting on {host}:{port}{activation}")
             logger.info("Available endpoints:")
             logger.info("  GET / - Service information")
             logger.info("  GET /health - Health check")
             logger.info("  GET /metrics - Prometheus metrics")
             logger.info("  POST / - Echo endpoint")
-            httpd.serve_forever()
+            if stop_reason is None:  # Otherwise a signal arrived during startup: drain (nothing) and act on it
+                httpd.serve_forever()
+
+            if stop_reason == 'terminate':
+                httpd.socket.close()  # Refuse new connections; a systemd socket keeps queueing them
+            remaining = httpd.drain(DRAIN_SECONDS)
+            if remaining:
+                logger.warning(f"Drain deadline of {DRAIN_SECONDS:g}s passed with {remaining} request(s) in flight")
+            if stop_reason == 'reexec':
+                reexec(httpd)
+            logger.info("Shutting down mock service...")
     except KeyboardInterrupt:
         logger.info("Shutting down mock service...")
     except Exception as e:
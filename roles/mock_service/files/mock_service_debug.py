@@ -0,0 +1,261 @@
+"""
+Debug and profiling endpoints for the mock service.
+
+Imported only when the debug surface is enabled (MOCK_SERVICE_DEBUG=1 or SIGUSR1),
+and served on a separate listener that defaults to 127.0.0.1:6060 so it is never
+exposed next to the public port.
+
+Endpoints:
+    GET /debug/profile?seconds=10&hz=100     sampling CPU profile, collapsed stacks (flamegraph.pl / speedscope);
+                                             X-Profile-Rounds/-Hz/-Seconds headers describe the run
+    GET /debug/tracemalloc/start?frames=10   start allocation tracing
+    GET /debug/tracemalloc/snapshot?top=20   top allocators; becomes the baseline for /diff
+    GET /debug/tracemalloc/diff?top=20       growth since the previous snapshot; becomes the new baseline
+    GET /debug/tracemalloc/stop              stop tracing and drop the baseline
+    GET /debug/threads                       stack dump of every thread
+    GET /debug/gc                            GC statistics (JSON)
+
+While the debug surface is enabled, python_gc_* metrics are appended to /metrics.
+"""
+import collections
+import gc
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger('mock-service.debug')
+
+MAX_PROFILE_SECONDS = 60
+MAX_PROFILE_HZ = 1000
+
+
+# =============================================================================
+# CPU PROFILING
+# =============================================================================
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample_profile(seconds, hz=100, exclude=()):
+    """
+    Sample the stacks of all other threads for `seconds` at `hz` samples per second.
+
+    Returns (collapsed stack lines, number of sampling rounds). Each line is
+    'thread;outermost;...;innermost count', the input format of flamegraph.pl.
+    """
+    interval = 1.0 / hz
+    skip = {threading.get_ident(), *exclude}
+    counts = collections.Counter()
+    rounds = 0
+    deadline = time.monotonic() + seconds
+    while True:
+        started = time.monotonic()
+        if started >= deadline:
+            break
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident in skip:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            counts[';'.join(reversed(stack))] += 1
+        rounds += 1
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    return [f"{stack} {count}" for stack, count in counts.most_common()], rounds
+
+
+# =============================================================================
+# MEMORY
+# =============================================================================
+
+class AllocationTracker:
+    """tracemalloc snapshots, each compared with the previous one."""
+
+    _FILTERS = (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        tracemalloc.Filter(False, '<unknown>'),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._baseline = None
+
+    def start(self, frames=10):
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            return f"tracemalloc tracing with {tracemalloc.get_traceback_limit()} frame(s)\n"
+
+    def stop(self):
+        with self._lock:
+            tracemalloc.stop()
+            self._baseline = None
+            return "tracemalloc stopped\n"
+
+    def _take(self):
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not tracing; call /debug/tracemalloc/start first")
+        return tracemalloc.take_snapshot().filter_traces(self._FILTERS)
+
+    def snapshot(self, top=20, key='lineno'):
+        with self._lock:
+            snapshot = self._take()
+            self._baseline = snapshot
+        stats = snapshot.statistics(key)
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"traced: {current / 1024:.1f} KiB, peak: {peak / 1024:.1f} KiB, top {top} by {key}:"]
+        lines.extend(str(stat) for stat in stats[:top])
+        return '\n'.join(lines) + '\n'
+
+    def diff(self, top=20, key='lineno'):
+        with self._lock:
+            snapshot = self._take()
+            baseline, self._baseline = self._baseline, snapshot
+        if baseline is None:
+            return "no baseline snapshot yet; this snapshot is now the baseline\n"
+        stats = snapshot.compare_to(baseline, key)
+        lines = [f"top {top} changes by {key} since the previous snapshot:"]
+        lines.extend(str(stat) for stat in stats[:top])
+        return '\n'.join(lines) + '\n'
+
+
+# =============================================================================
+# THREADS AND GC
+# =============================================================================
+
+def thread_dump():
+    threads = {thread.ident: thread for thread in threading.enumerate()}
+    sections = []
+    for ident, frame in sys._current_frames().items():
+        thread = threads.get(ident)
+        name = thread.name if thread else f"thread-{ident}"
+        daemon = ' daemon' if thread is not None and thread.daemon else ''
+        sections.append(f'Thread "{name}" (id {ident}{daemon}):\n' + ''.join(traceback.format_stack(frame)))
+    return '\n'.join(sections)
+
+
+def gc_stats():
+    return {
+        'enabled': gc.isenabled(),
+        'thresholds': gc.get_threshold(),
+        'counts': gc.get_count(),
+        'generations': gc.get_stats(),
+        'garbage': len(gc.garbage),
+    }
+
+
+def gc_metrics():
+    """Return GC statistics in Prometheus text format."""
+    stats = gc.get_stats()
+    counts = gc.get_count()
+    families = (
+        ('python_gc_objects_collected_total', 'counter', 'Objects collected during GC',
+         [stat['collected'] for stat in stats]),
+        ('python_gc_objects_uncollectable_total', 'counter', 'Uncollectable objects found during GC',
+         [stat['uncollectable'] for stat in stats]),
+        ('python_gc_collections_total', 'counter', 'Number of times this generation was collected',
+         [stat['collections'] for stat in stats]),
+        ('python_gc_generation_count', 'gauge', 'Allocations (generation 0) or collections (1, 2) since the generation was last collected',
+         list(counts)),
+    )
+    lines = []
+    for name, metric_type, help_text, values in families:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        lines.extend(f'{name}{{generation="{generation}"}} {value}' for generation, value in enumerate(values))
+    return '\n'.join(lines) + '\n'
+
+
+# =============================================================================
+# HTTP
+# =============================================================================
+
+class DebugHTTPRequestHandler(BaseHTTPRequestHandler):
+    tracker = AllocationTracker()
+    profile_lock = threading.Lock()
+    server_thread_ident = None  # Set by start(); excluded from profiles
+
+    def _send_text(self, status, text, content_type='text/plain; charset=utf-8', headers=None):
+        body = text.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        try:
+            if url.path == '/debug/profile':
+                self._handle_profile(params)
+            elif url.path == '/debug/tracemalloc/start':
+                self._send_text(200, self.tracker.start(int(params.get('frames', 10))))
+            elif url.path == '/debug/tracemalloc/snapshot':
+                self._send_text(200, self.tracker.snapshot(int(params.get('top', 20)), params.get('key', 'lineno')))
+            elif url.path == '/debug/tracemalloc/diff':
+                self._send_text(200, self.tracker.diff(int(params.get('top', 20)), params.get('key', 'lineno')))
+            elif url.path == '/debug/tracemalloc/stop':
+                self._send_text(200, self.tracker.stop())
+            elif url.path == '/debug/threads':
+                self._send_text(200, thread_dump())
+            elif url.path == '/debug/gc':
+                self._send_text(200, json.dumps(gc_stats(), indent=2), 'application/json')
+            elif url.path in ('/debug', '/debug/'):
+                self._send_text(200, __doc__)
+            else:
+                self._send_text(404, f"unknown debug endpoint {url.path}\n")
+        except RuntimeError as e:
+            self._send_text(409, f"{e}\n")
+        except ValueError as e:
+            self._send_text(400, f"{e}\n")
+
+    def _handle_profile(self, params):
+        seconds = float(params.get('seconds', 10))
+        hz = int(params.get('hz', 100))
+        if not 0 < seconds <= MAX_PROFILE_SECONDS or not 0 < hz <= MAX_PROFILE_HZ:
+            raise ValueError(f"seconds must be in (0, {MAX_PROFILE_SECONDS}] and hz in (0, {MAX_PROFILE_HZ}]")
+        if not self.profile_lock.acquire(blocking=False):
+            raise RuntimeError("a profile is already running")
+        try:
+            logger.info(f"CPU profile for {seconds}s at {hz}Hz requested from {self.client_address[0]}")
+            exclude = (self.server_thread_ident,) if self.server_thread_ident else ()
+            lines, rounds = sample_profile(seconds, hz, exclude)
+        finally:
+            self.profile_lock.release()
+        # The body stays pure collapsed-stack input; the sampling summary goes in headers
+        self._send_text(200, ''.join(f"{line}\n" for line in lines),
+                        headers={'X-Profile-Rounds': str(rounds), 'X-Profile-Hz': str(hz),
+                                 'X-Profile-Seconds': f"{seconds:g}"})
+
+    def log_message(self, format, *args):
+        """Override to use logging instead of print"""
+        logger.info(f"HTTP: {format % args}")
+
+
+def start(host='127.0.0.1', port=6060):
+    """Start the debug listener in a daemon thread and return the server."""
+    handler = type('BoundDebugHTTPRequestHandler', (DebugHTTPRequestHandler,), {})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='debug-server', daemon=True)
+    thread.start()
+    handler.server_thread_ident = thread.ident
+    logger.info(f"Debug endpoints listening on {host}:{server.server_address[1]} (GET /debug for the list)")
+    return server
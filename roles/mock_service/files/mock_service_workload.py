@@ -0,0 +1,562 @@
+"""
+Synthetic workload engine for the mock service.
+
+Loaded only when MOCK_SERVICE_WORKLOAD_FILE points at a route spec (JSON, or YAML
+when PyYAML is installed). Each route simulates the cost profile of a real
+service so capacity tests of the monitoring stack see realistic traffic shapes:
+
+    seed: 42                                   # optional, makes runs reproducible
+    routes:
+      - path: /api/orders
+        methods: [GET]                         # GET and/or POST, default [GET]
+        latency: {distribution: lognormal, median_ms: 40, p99_ms: 400}
+        response_bytes: {min: 512, max: 8192}  # or a fixed size
+        cpu_ms: 5                              # CPU burned per request
+        error_ratio: 0.01                      # share of requests answered with error_status
+        error_status: 500
+        mariadb: {query: "SELECT 1"}           # downstream call as the monitoring user
+
+Latency distributions (a plain number is a constant latency in ms):
+    constant     ms
+    uniform      min_ms, max_ms
+    normal       mean_ms, stddev_ms (clamped at 0)
+    exponential  mean_ms
+    lognormal    median_ms, p99_ms
+
+The sampled latency is the total response time: CPU work and the downstream call
+count towards it and only the remainder is slept. A failed downstream call is
+answered with 502.
+
+MariaDB connection settings come from the environment (MOCK_SERVICE_MARIADB_HOST,
+_PORT, _USER, _PASSWORD, _DATABASE), never from the spec. The client speaks the
+MySQL protocol with mysql_native_password using only the standard library and
+keeps idle connections for reuse.
+
+Every route is instrumented in /metrics:
+    mock_service_route_requests_total{route,method,code}
+    mock_service_route_request_duration_seconds{route,method}      histogram
+    mock_service_route_response_bytes_total{route,method}
+    mock_service_route_in_flight{route,method}
+    mock_service_route_downstream_duration_seconds{route,downstream} histogram
+    mock_service_route_downstream_errors_total{route,downstream}
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import socket
+import struct
+import threading
+import time
+
+logger = logging.getLogger('mock-service.workload')
+
+METHODS = ('GET', 'POST')
+RESERVED_PATHS = ('/health', '/metrics')
+MAX_RESPONSE_BYTES = 64 * 1024 * 1024
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_Z99 = 2.3263478740408408  # 99th percentile of the standard normal distribution
+
+
+class SpecError(ValueError):
+    """Raised for invalid workload specs."""
+
+
+class DownstreamError(Exception):
+    """Raised when a downstream call fails."""
+
+
+# =============================================================================
+# SPEC
+# =============================================================================
+
+def load_spec(path):
+    """Parse a workload spec file (.yml/.yaml needs PyYAML, anything else is JSON)."""
+    with open(path) as f:
+        text = f.read()
+    if path.endswith(('.yml', '.yaml')):
+        try:
+            import yaml
+        except ImportError:
+            raise SpecError(f"{path}: PyYAML is not installed, use a JSON spec")
+        return yaml.safe_load(text) or {}
+    return json.loads(text)
+
+
+def _number(spec, key, low=0.0, high=math.inf, default=None):
+    value = spec.get(key, default)
+    if value is None:
+        raise SpecError(f"'{key}' is required")
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise SpecError(f"'{key}' must be a number, got {value!r}")
+    if not low <= value <= high:
+        raise SpecError(f"'{key}'={value:g} is outside {low:g}..{high:g}")
+    return value
+
+
+def latency_sampler(spec, rng):
+    """Return a function that draws a latency in seconds from a latency spec."""
+    if spec is None:
+        return lambda: 0.0
+    if isinstance(spec, (int, float)) and not isinstance(spec, bool):
+        spec = {'distribution': 'constant', 'ms': spec}
+    if not isinstance(spec, dict):
+        raise SpecError(f"latency must be a number or a mapping, got {spec!r}")
+    distribution = spec.get('distribution', 'constant')
+    if distribution == 'constant':
+        seconds = _number(spec, 'ms') / 1000
+        return lambda: seconds
+    if distribution == 'uniform':
+        low, high = _number(spec, 'min_ms') / 1000, _number(spec, 'max_ms') / 1000
+        if low > high:
+            raise SpecError("'min_ms' must not exceed 'max_ms'")
+        return lambda: rng.uniform(low, high)
+    if distribution == 'normal':
+        mean, stddev = _number(spec, 'mean_ms') / 1000, _number(spec, 'stddev_ms') / 1000
+        return lambda: max(0.0, rng.gauss(mean, stddev))
+    if distribution == 'exponential':
+        mean = _number(spec, 'mean_ms', low=1e-9) / 1000
+        return lambda: rng.expovariate(1 / mean)
+    if distribution == 'lognormal':
+        median = _number(spec, 'median_ms', low=1e-9)
+        p99 = _number(spec, 'p99_ms', low=median)
+        mu, sigma = math.log(median / 1000), math.log(p99 / median) / _Z99
+        return lambda: rng.lognormvariate(mu, sigma)
+    raise SpecError(f"unknown latency distribution {distribution!r}")
+
+
+def size_sampler(spec, rng):
+    """Return (function drawing a response size in bytes, largest possible size)."""
+    if spec is None:
+        spec = 0
+    if isinstance(spec, dict):
+        low = int(_number(spec, 'min', high=MAX_RESPONSE_BYTES))
+        high = int(_number(spec, 'max', high=MAX_RESPONSE_BYTES))
+        if low > high:
+            raise SpecError("response_bytes 'min' must not exceed 'max'")
+        return (lambda: rng.randint(low, high)), high
+    size = int(_number({'response_bytes': spec}, 'response_bytes', high=MAX_RESPONSE_BYTES))
+    return (lambda: size), size
+
+
+def burn_cpu(seconds):
+    """Spin on the calling thread until it has used `seconds` of CPU time."""
+    deadline = time.thread_time() + seconds
+    while time.thread_time() < deadline:
+        sum(i * i for i in range(200))
+
+
+class Route:
+    """One route of the workload spec with its samplers."""
+    __slots__ = ('path', 'methods', 'latency', 'response_bytes', 'cpu_seconds', 'error_ratio', 'error_status',
+                 'mariadb_query', 'rng', 'filler')
+
+    def __init__(self, spec, rng):
+        if not isinstance(spec, dict):
+            raise SpecError(f"route must be a mapping, got {spec!r}")
+        self.path = spec.get('path')
+        if not isinstance(self.path, str) or not self.path.startswith('/'):
+            raise SpecError(f"route path must start with '/', got {self.path!r}")
+        if self.path in RESERVED_PATHS:
+            raise SpecError(f"route path {self.path} is reserved by the mock service")
+        try:
+            self.methods = [method.upper() for method in spec.get('methods', ['GET'])]
+        except AttributeError:
+            raise SpecError(f"{self.path}: 'methods' must be a list of strings")
+        unknown = sorted(set(self.methods) - set(METHODS))
+        if unknown or not self.methods:
+            raise SpecError(f"{self.path}: methods must be a non-empty subset of {list(METHODS)}, got {unknown}")
+        try:
+            self.latency = latency_sampler(spec.get('latency'), rng)
+            self.response_bytes, max_bytes = size_sampler(spec.get('response_bytes'), rng)
+            self.cpu_seconds = _number(spec, 'cpu_ms', default=0) / 1000
+            self.error_ratio = _number(spec, 'error_ratio', high=1.0, default=0)
+            self.error_status = int(_number(spec, 'error_status', low=400, high=599, default=500))
+        except SpecError as e:
+            raise SpecError(f"{self.path}: {e}")
+        mariadb = spec.get('mariadb')
+        if mariadb is True:
+            mariadb = {}
+        if mariadb is not None and not isinstance(mariadb, dict):
+            raise SpecError(f"{self.path}: 'mariadb' must be true or a mapping")
+        self.mariadb_query = (mariadb or {}).get('query', 'SELECT 1') if mariadb is not None else None
+        self.rng = rng
+        self.filler = b'x' * max_bytes
+
+
+# =============================================================================
+# MARIADB CLIENT
+# =============================================================================
+
+CLIENT_LONG_PASSWORD = 0x00000001
+CLIENT_CONNECT_WITH_DB = 0x00000008
+CLIENT_PROTOCOL_41 = 0x00000200
+CLIENT_TRANSACTIONS = 0x00002000
+CLIENT_SECURE_CONNECTION = 0x00008000
+CLIENT_PLUGIN_AUTH = 0x00080000
+COM_QUIT = 0x01
+COM_QUERY = 0x03
+
+
+def native_password_scramble(password, salt):
+    """mysql_native_password: SHA1(password) XOR SHA1(salt + SHA1(SHA1(password)))."""
+    if not password:
+        return b''
+    stage1 = hashlib.sha1(password.encode()).digest()
+    stage2 = hashlib.sha1(salt + hashlib.sha1(stage1).digest()).digest()
+    return bytes(a ^ b for a, b in zip(stage1, stage2))
+
+
+def _error_message(payload):
+    code = struct.unpack_from('<H', payload, 1)[0]
+    message = payload[9:] if payload[3:4] == b'#' else payload[3:]
+    return f"MariaDB error {code}: {message.decode(errors='replace')}"
+
+
+class MariaDBConnection:
+    """A single authenticated connection speaking the MySQL client/server protocol."""
+
+    def __init__(self, host, port, user, password, database, timeout):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        try:
+            self.seq = 0
+            self._authenticate(user, password, database)
+        except Exception:
+            self.sock.close()
+            raise
+
+    def _read_exact(self, size):
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise DownstreamError("MariaDB closed the connection")
+            data += chunk
+        return bytes(data)
+
+    def read_packet(self):
+        header = self._read_exact(4)
+        length = header[0] | header[1] << 8 | header[2] << 16
+        self.seq = (header[3] + 1) & 0xFF
+        return self._read_exact(length)
+
+    def write_packet(self, payload):
+        self.sock.sendall(struct.pack('<I', len(payload))[:3] + bytes([self.seq]) + payload)
+        self.seq = (self.seq + 1) & 0xFF
+
+    def _authenticate(self, user, password, database):
+        handshake = self.read_packet()
+        if handshake[0] == 0xFF:
+            raise DownstreamError(_error_message(handshake))
+        if handshake[0] != 10:
+            raise DownstreamError(f"unsupported MariaDB protocol version {handshake[0]}")
+        pos = handshake.index(b'\0', 1) + 1 + 4  # server version, connection id
+        salt = handshake[pos:pos + 8]
+        pos += 9
+        capabilities = struct.unpack_from('<H', handshake, pos)[0]
+        pos += 5
+        capabilities |= struct.unpack_from('<H', handshake, pos)[0] << 16
+        salt_length = handshake[pos + 2]
+        pos += 13
+        if capabilities & CLIENT_SECURE_CONNECTION:
+            salt += handshake[pos:pos + max(13, salt_length - 8) - 1]
+
+        flags = (CLIENT_LONG_PASSWORD | CLIENT_PROTOCOL_41 | CLIENT_TRANSACTIONS
+                 | CLIENT_SECURE_CONNECTION | CLIENT_PLUGIN_AUTH)
+        if database:
+            flags |= CLIENT_CONNECT_WITH_DB
+        auth = native_password_scramble(password, salt)
+        response = struct.pack('<IIB23x', flags, 1 << 24, 45)  # 45: utf8mb4_general_ci
+        response += user.encode() + b'\0' + bytes([len(auth)]) + auth
+        if database:
+            response += database.encode() + b'\0'
+        response += b'mysql_native_password\0'
+        self.write_packet(response)
+
+        reply = self.read_packet()
+        if reply[0] == 0xFE:  # Auth switch request
+            plugin, _, data = reply[1:].partition(b'\0')
+            if plugin != b'mysql_native_password':
+                raise DownstreamError(f"unsupported MariaDB auth plugin {plugin.decode(errors='replace')}")
+            self.write_packet(native_password_scramble(password, data.rstrip(b'\0')))
+            reply = self.read_packet()
+        if reply[0] == 0xFF:
+            raise DownstreamError(_error_message(reply))
+        if reply[0] != 0x00:
+            raise DownstreamError(f"unexpected MariaDB auth reply 0x{reply[0]:02x}")
+
+    def query(self, sql):
+        """Run a query and return the number of rows it produced."""
+        self.seq = 0
+        self.write_packet(bytes([COM_QUERY]) + sql.encode())
+        first = self.read_packet()
+        if first[0] == 0xFF:
+            raise DownstreamError(_error_message(first))
+        if first[0] == 0x00:
+            return 0
+        rows = 0
+        in_rows = False
+        while True:
+            packet = self.read_packet()
+            if packet[0] == 0xFF:
+                raise DownstreamError(_error_message(packet))
+            if packet[0] == 0xFE and len(packet) < 9:  # EOF after column definitions, then after rows
+                if in_rows:
+                    return rows
+                in_rows = True
+            elif in_rows:
+                rows += 1
+
+    def close(self):
+        try:
+            self.seq = 0
+            self.write_packet(bytes([COM_QUIT]))
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class MariaDBClient:
+    """Thread-safe client that reuses idle connections."""
+
+    def __init__(self, host='127.0.0.1', port=3306, user='monitoring', password='', database='monitoring',
+                 timeout=5.0, max_idle=8):
+        self.settings = (host, int(port), user, password, database, float(timeout))
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        return cls(
+            host=environ.get('MOCK_SERVICE_MARIADB_HOST', '127.0.0.1'),
+            port=environ.get('MOCK_SERVICE_MARIADB_PORT', 3306),
+            user=environ.get('MOCK_SERVICE_MARIADB_USER', 'monitoring'),
+            password=environ.get('MOCK_SERVICE_MARIADB_PASSWORD', ''),
+            database=environ.get('MOCK_SERVICE_MARIADB_DATABASE', 'monitoring'),
+            timeout=environ.get('MOCK_SERVICE_MARIADB_TIMEOUT', 5.0),
+        )
+
+    def query(self, sql):
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        try:
+            if connection is None:
+                connection = MariaDBConnection(*self.settings)
+            rows = connection.query(sql)
+        except (OSError, DownstreamError, IndexError, struct.error) as e:
+            if connection is not None:
+                connection.sock.close()
+            raise DownstreamError(str(e) or e.__class__.__name__)
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(connection)
+                connection = None
+        if connection is not None:
+            connection.close()
+        return rows
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+# =============================================================================
+# METRICS
+# =============================================================================
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in pairs)
+
+
+class Histogram:
+    """Fixed-bucket histogram (counts are stored per bucket, rendered cumulatively)."""
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            index = len(self.buckets)
+        self.counts[index] += 1
+        self.sum += value
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            cumulative += count
+            le = bound if bound == '+Inf' else repr(float(bound))
+            yield f'{name}_bucket{{{_labels((*labels, ("le", le)))}}} {cumulative}'
+        yield f'{name}_sum{{{_labels(labels)}}} {self.sum}'
+        yield f'{name}_count{{{_labels(labels)}}} {cumulative}'
+
+
+class WorkloadMetrics:
+    """Per-route request, latency, size and downstream metrics."""
+
+    def __init__(self, routes):
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.response_bytes = {}
+        self.in_flight = {}
+        self.durations = {}
+        self.downstream_durations = {}
+        self.downstream_errors = {}
+        for route in routes:  # Series exist from the first scrape, before any traffic
+            codes = {200}
+            if route.error_ratio:
+                codes.add(route.error_status)
+            if route.mariadb_query is not None:
+                codes.add(502)
+            for method in route.methods:
+                for code in codes:
+                    self.requests[(route.path, method, code)] = 0
+                self.response_bytes[(route.path, method)] = 0
+                self.in_flight[(route.path, method)] = 0
+                self.durations[(route.path, method)] = Histogram()
+            if route.mariadb_query is not None:
+                self.downstream_durations[(route.path, 'mariadb')] = Histogram()
+                self.downstream_errors[(route.path, 'mariadb')] = 0
+
+    def started(self, path, method):
+        with self._lock:
+            self.in_flight[(path, method)] += 1
+
+    def finished(self, path, method, status, seconds, size):
+        with self._lock:
+            key = (path, method)
+            self.in_flight[key] -= 1
+            self.requests[(path, method, status)] = self.requests.get((path, method, status), 0) + 1
+            self.response_bytes[key] += size
+            self.durations[key].observe(seconds)
+
+    def downstream(self, path, downstream, seconds, failed):
+        with self._lock:
+            self.downstream_durations[(path, downstream)].observe(seconds)
+            if failed:
+                self.downstream_errors[(path, downstream)] += 1
+
+    def render(self):
+        with self._lock:
+            families = (
+                ('mock_service_route_requests_total', 'counter', 'Requests served by workload routes',
+                 ('route', 'method', 'code'), sorted(self.requests.items())),
+                ('mock_service_route_request_duration_seconds', 'histogram', 'Workload route response time',
+                 ('route', 'method'), sorted(self.durations.items())),
+                ('mock_service_route_response_bytes_total', 'counter', 'Response body bytes sent by workload routes',
+                 ('route', 'method'), sorted(self.response_bytes.items())),
+                ('mock_service_route_in_flight', 'gauge', 'Workload requests currently being served',
+                 ('route', 'method'), sorted(self.in_flight.items())),
+                ('mock_service_route_downstream_duration_seconds', 'histogram', 'Downstream call duration',
+                 ('route', 'downstream'), sorted(self.downstream_durations.items())),
+                ('mock_service_route_downstream_errors_total', 'counter', 'Failed downstream calls',
+                 ('route', 'downstream'), sorted(self.downstream_errors.items())),
+            )
+            lines = []
+            for name, metric_type, help_text, label_names, series in families:
+                if not series:
+                    continue
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for key, value in series:
+                    labels = tuple(zip(label_names, key))
+                    if metric_type == 'histogram':
+                        lines.extend(value.samples(name, labels))
+                    else:
+                        lines.append(f'{name}{{{_labels(labels)}}} {value}')
+        return '\n'.join(lines) + '\n' if lines else ''
+
+
+# =============================================================================
+# ENGINE
+# =============================================================================
+
+class Workload:
+    """Routes of a workload spec, served through the mock service's request handler."""
+
+    def __init__(self, spec, mariadb=None):
+        if not isinstance(spec, dict) or not isinstance(spec.get('routes'), list):
+            raise SpecError("workload spec must be a mapping with a 'routes' list")
+        rng = random.Random(spec.get('seed'))
+        self.routes = {}
+        for route in (Route(route_spec, rng) for route_spec in spec['routes']):
+            for method in route.methods:
+                if (method, route.path) in self.routes:
+                    raise SpecError(f"duplicate route {method} {route.path}")
+                self.routes[(method, route.path)] = route
+        unique_routes = list({id(route): route for route in self.routes.values()}.values())
+        if mariadb is None and any(route.mariadb_query is not None for route in unique_routes):
+            mariadb = MariaDBClient.from_env()
+        self.mariadb = mariadb
+        self.stats = WorkloadMetrics(unique_routes)
+
+    @classmethod
+    def from_file(cls, path, mariadb=None):
+        return cls(load_spec(path), mariadb)
+
+    def serve(self, handler):
+        """Serve the request if it matches a route; return False to fall through to the built-in endpoints."""
+        path = handler.path.split('?', 1)[0]
+        route = self.routes.get((handler.command, path))
+        if route is None:
+            return False
+        started = time.monotonic()
+        self.stats.started(path, handler.command)
+        status, body = 500, b''
+        try:
+            length = int(handler.headers.get('Content-Length') or 0)
+            if length:
+                handler.rfile.read(length)
+            status, body = self._run(route, started)
+            handler.send_response(status)
+            handler.send_header('Content-Type', 'application/octet-stream' if status < 400 else 'application/json')
+            handler.send_header('Content-Length', str(len(body)))
+            handler.end_headers()
+            handler.wfile.write(body)
+        finally:
+            self.stats.finished(path, handler.command, status, time.monotonic() - started, len(body))
+        return True
+
+    def _run(self, route, started):
+        target = route.latency()
+        if route.cpu_seconds:
+            burn_cpu(route.cpu_seconds)
+        status = 200
+        if route.mariadb_query is not None:
+            call_started = time.monotonic()
+            failed = False
+            try:
+                self.mariadb.query(route.mariadb_query)
+            except DownstreamError as e:
+                failed = True
+                status = 502
+                logger.warning(f"{route.path}: MariaDB call failed: {e}")
+            self.stats.downstream(route.path, 'mariadb', time.monotonic() - call_started, failed)
+        if status == 200 and route.error_ratio and route.rng.random() < route.error_ratio:
+            status = route.error_status
+        remaining = target - (time.monotonic() - started)
+        if remaining > 0:
+            time.sleep(remaining)
+        if status != 200:
+            return status, json.dumps({'error': 'synthetic error' if status != 502 else 'downstream error',
+                                       'route': route.path}).encode()
+        return status, route.filler[:route.response_bytes()]
+
+    def metrics(self):
+        return self.stats.render()
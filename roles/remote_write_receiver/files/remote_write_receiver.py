@@ -0,0 +1,874 @@
+#!/usr/bin/env python3
+"""
+Prometheus remote-write receiver with downsampled long-term storage.
+
+Accepts snappy-compressed protobuf WriteRequests on POST /api/v1/write, rolls the
+samples up into 5m and 1h buckets (count, sum, min, max, last per series) and
+stores closed buckets in a compact columnar on-disk format. Range queries over
+the rollups are answered on GET /api/v1/query_range with a Prometheus-compatible
+response, so long-range dashboards never touch raw 15s samples.
+
+Enough of the Prometheus HTTP API is served for a Grafana Prometheus data source:
+instant queries (/api/v1/query, used by the data source health check), series and
+label lookups, and /api/v1/status/buildinfo. Queries are plain series selectors;
+the only other expressions accepted are numeric constants such as `1+1`.
+
+Only the standard library is used: snappy block decompression and the protobuf
+wire format needed for WriteRequest are implemented here.
+
+On-disk layout (RECEIVER_DATA_DIR):
+    series.json                 label sets, index = series id
+    <resolution>/<segment>.col  columnar segments of closed buckets
+
+Segment format (little-endian): a header (magic, version, row count, min and max
+bucket start) followed by one contiguous array per column: series_id (uint32),
+bucket (int64, ms), count (uint32), sum, min, max, last (float64). Rows are sorted
+by (series_id, bucket). Queries only read the columns the aggregation needs.
+Segments of a fully closed block window are compacted into one file.
+"""
+import ast
+import json
+import logging
+import math
+import operator
+import os
+import re
+import signal
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger('remote-write-receiver')
+
+# name -> (bucket width, compaction block window), both in milliseconds
+RESOLUTIONS = {
+    '5m': (5 * 60 * 1000, 24 * 3600 * 1000),
+    '1h': (3600 * 1000, 30 * 24 * 3600 * 1000),
+}
+AGGREGATIONS = ('avg', 'sum', 'count', 'min', 'max', 'last')
+# Largest uncompressed WriteRequest accepted (Prometheus sends batches of a few MB at most)
+MAX_WRITE_REQUEST_BYTES = 64 * 1024 * 1024
+# Largest snappy-compressed body that can decompress to MAX_WRITE_REQUEST_BYTES (snappy's MaxEncodedLen)
+MAX_COMPRESSED_WRITE_REQUEST_BYTES = 32 + MAX_WRITE_REQUEST_BYTES + MAX_WRITE_REQUEST_BYTES // 6
+
+SEGMENT_MAGIC = b'RWRC'
+SEGMENT_VERSION = 1
+SEGMENT_HEADER = struct.Struct('<4sBxxxIqq')
+COLUMNS = (
+    ('series_id', 'I'),
+    ('bucket', 'q'),
+    ('count', 'I'),
+    ('sum', 'd'),
+    ('min', 'd'),
+    ('max', 'd'),
+    ('last', 'd'),
+)
+# Columns each aggregation needs besides series_id and bucket
+AGGREGATION_COLUMNS = {
+    'avg': ('count', 'sum'),
+    'sum': ('sum',),
+    'count': ('count',),
+    'min': ('min',),
+    'max': ('max',),
+    'last': ('last',),
+}
+_SWAP = sys.byteorder != 'little'
+
+
+class DecodeError(ValueError):
+    """Raised for malformed snappy or protobuf payloads."""
+
+
+# =============================================================================
+# SNAPPY (block format)
+# =============================================================================
+
+def _uvarint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise DecodeError("truncated varint")
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+        if shift > 63:
+            raise DecodeError("varint too long")
+
+
+def snappy_decompress(data, max_length=MAX_WRITE_REQUEST_BYTES):
+    """
+    Decompress a snappy block (the encoding Prometheus uses for remote write).
+
+    Every tag and offset read is bounds-checked, and the output may never grow past
+    the declared length, which itself may not exceed max_length.
+    """
+    length, pos = _uvarint(data, 0)
+    if length > max_length:
+        raise DecodeError(f"declared length {length} exceeds the {max_length} byte limit")
+    out = bytearray()
+    end = len(data)
+    while pos < end:
+        tag = data[pos]
+        pos += 1
+        kind = tag & 0x03
+        if kind == 0:  # literal
+            size = tag >> 2
+            if size >= 60:
+                extra = size - 59
+                if pos + extra > end:
+                    raise DecodeError("truncated literal length")
+                size = int.from_bytes(data[pos:pos + extra], 'little')
+                pos += extra
+            size += 1
+            if pos + size > end:
+                raise DecodeError("literal runs past end of input")
+            if len(out) + size > length:
+                raise DecodeError(f"decompressed data exceeds declared length {length}")
+            out += data[pos:pos + size]
+            pos += size
+            continue
+        width = (1, 2, 4)[kind - 1]  # Offset bytes after the tag
+        if pos + width > end:
+            raise DecodeError("truncated copy tag")
+        if kind == 1:
+            size = 4 + ((tag >> 2) & 0x07)
+            offset = ((tag >> 5) << 8) | data[pos]
+        else:
+            size = (tag >> 2) + 1
+            offset = int.from_bytes(data[pos:pos + width], 'little')
+        pos += width
+        if offset == 0 or offset > len(out):
+            raise DecodeError("invalid copy offset")
+        if len(out) + size > length:
+            raise DecodeError(f"decompressed data exceeds declared length {length}")
+        start = len(out) - offset
+        if offset >= size:
+            out += out[start:start + size]
+        else:  # overlapping copy repeats the last `offset` bytes
+            pattern = out[start:]
+            out += (pattern * (size // offset + 1))[:size]
+    if len(out) != length:
+        raise DecodeError(f"decompressed length {len(out)} != declared {length}")
+    return bytes(out)
+
+
+# =============================================================================
+# PROTOBUF (prometheus.WriteRequest)
+# =============================================================================
+
+def _fields(data):
+    """Yield (field number, wire type, value) for each field of a protobuf message."""
+    pos = 0
+    end = len(data)
+    while pos < end:
+        key, pos = _uvarint(data, pos)
+        field, wire = key >> 3, key & 0x07
+        if wire == 0:
+            value, pos = _uvarint(data, pos)
+        elif wire == 1:
+            value = data[pos:pos + 8]
+            pos += 8
+        elif wire == 2:
+            size, pos = _uvarint(data, pos)
+            value = data[pos:pos + size]
+            pos += size
+        elif wire == 5:
+            value = data[pos:pos + 4]
+            pos += 4
+        else:
+            raise DecodeError(f"unsupported wire type {wire}")
+        if pos > end:
+            raise DecodeError("field runs past end of message")
+        yield field, wire, value
+
+
+def _decode_label(data):
+    name = value = ''
+    for field, wire, raw in _fields(data):
+        if wire != 2:
+            continue
+        if field == 1:
+            name = raw.decode('utf-8')
+        elif field == 2:
+            value = raw.decode('utf-8')
+    return name, value
+
+
+def _decode_sample(data):
+    value = 0.0
+    timestamp = 0
+    for field, wire, raw in _fields(data):
+        if field == 1 and wire == 1:
+            value = struct.unpack('<d', raw)[0]
+        elif field == 2 and wire == 0:
+            timestamp = raw - (1 << 64) if raw >= 1 << 63 else raw
+    return value, timestamp
+
+
+def decode_write_request(data):
+    """
+    Decode a WriteRequest into [(labels dict, [(value, timestamp ms), ...]), ...].
+
+    Exemplars, native histograms and metadata are skipped.
+    """
+    timeseries = []
+    for field, wire, raw in _fields(data):
+        if field != 1 or wire != 2:
+            continue
+        labels = {}
+        samples = []
+        for ts_field, ts_wire, ts_raw in _fields(raw):
+            if ts_wire != 2:
+                continue
+            if ts_field == 1:
+                name, value = _decode_label(ts_raw)
+                labels[name] = value
+            elif ts_field == 2:
+                samples.append(_decode_sample(ts_raw))
+        timeseries.append((labels, samples))
+    return timeseries
+
+
+# =============================================================================
+# SERIES SELECTORS
+# =============================================================================
+
+_SELECTOR_RE = re.compile(r'\s*([a-zA-Z_:][a-zA-Z0-9_:]*)?\s*(?:\{(.*)\})?\s*\Z')
+_STRING_ESCAPE_RE = re.compile(r'\\(.)')
+_STRING_ESCAPES = {'n': '\n', 't': '\t'}
+_MATCHER_RE = re.compile(r'\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*(=~|!~|!=|=)\s*"((?:[^"\\]|\\.)*)"\s*(?:,|\Z)')
+
+
+def parse_selector(selector):
+    """Parse 'name{label="v",label=~"re"}' into [(label, op, value), ...]."""
+    match = _SELECTOR_RE.match(selector)
+    if match is None:
+        raise ValueError(f"unsupported selector: {selector!r}")
+    name, body = match.groups()
+    matchers = [('__name__', '=', name)] if name else []
+    pos = 0
+    body = (body or '').strip()
+    while pos < len(body):
+        m = _MATCHER_RE.match(body, pos)
+        if m is None:
+            raise ValueError(f"unsupported selector: {selector!r}")
+        label, op, value = m.groups()
+        value = _STRING_ESCAPE_RE.sub(lambda e: _STRING_ESCAPES.get(e.group(1), e.group(1)), value)
+        if op in ('=~', '!~'):
+            try:
+                value = re.compile(value)
+            except re.error as e:
+                raise ValueError(f"invalid regular expression {value!r} in {selector!r}: {e}") from None
+        matchers.append((label, op, value))
+        pos = m.end()
+    if not matchers:
+        raise ValueError("selector must have a metric name or at least one matcher")
+    return matchers
+
+
+def matches(labels, matchers):
+    for label, op, value in matchers:
+        actual = labels.get(label, '')
+        if op == '=':
+            ok = actual == value
+        elif op == '!=':
+            ok = actual != value
+        elif op == '=~':
+            ok = value.fullmatch(actual) is not None
+        else:
+            ok = value.fullmatch(actual) is None
+        if not ok:
+            return False
+    return True
+
+
+_CONSTANT_OPERATORS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+    ast.Mod: operator.mod, ast.USub: operator.neg, ast.UAdd: operator.pos,
+}
+
+
+def evaluate_constant(expression):
+    """
+    Evaluate a PromQL expression made only of numbers and arithmetic (e.g. `1+1`,
+    Grafana's health check query); returns None for anything else.
+    """
+    def evaluate(node):
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            return float(node.value)
+        if isinstance(node, ast.BinOp) and type(node.op) in _CONSTANT_OPERATORS:
+            left, right = evaluate(node.left), evaluate(node.right)
+            if isinstance(node.op, (ast.Div, ast.Mod)) and right == 0:  # PromQL yields Inf/NaN, not an error
+                return math.nan if left == 0 or isinstance(node.op, ast.Mod) else math.copysign(math.inf, left)
+            return _CONSTANT_OPERATORS[type(node.op)](left, right)
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _CONSTANT_OPERATORS:
+            return _CONSTANT_OPERATORS[type(node.op)](evaluate(node.operand))
+        raise ValueError
+
+    if len(expression) > 256:
+        return None
+    try:
+        return evaluate(ast.parse(expression.strip(), mode='eval').body)
+    except (SyntaxError, ValueError, OverflowError):
+        return None
+
+
+# =============================================================================
+# COLUMNAR SEGMENTS
+# =============================================================================
+
+def write_segment(path, rows):
+    """Write rows [(series_id, bucket, count, sum, min, max, last), ...] sorted by (series_id, bucket)."""
+    rows = sorted(rows, key=lambda r: (r[0], r[1]))
+    columns = [array(typecode, (row[i] for row in rows)) for i, (_, typecode) in enumerate(COLUMNS)]
+    buckets = columns[1]
+    header = SEGMENT_HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, len(rows), min(buckets), max(buckets))
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        for column in columns:
+            if _SWAP:
+                column.byteswap()
+            column.tofile(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return Segment(path, len(rows), min(buckets), max(buckets))
+
+
+class Segment:
+    """A columnar segment file; only the header is kept in memory."""
+
+    __slots__ = ('path', 'rows', 'min_bucket', 'max_bucket')
+
+    def __init__(self, path, rows, min_bucket, max_bucket):
+        self.path = path
+        self.rows = rows
+        self.min_bucket = min_bucket
+        self.max_bucket = max_bucket
+
+    @classmethod
+    def open(cls, path):
+        with open(path, 'rb') as f:
+            magic, version, rows, min_bucket, max_bucket = SEGMENT_HEADER.unpack(f.read(SEGMENT_HEADER.size))
+        if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+            raise DecodeError(f"{path}: not a version {SEGMENT_VERSION} rollup segment")
+        return cls(path, rows, min_bucket, max_bucket)
+
+    def read_columns(self, names, f=None):
+        """Read the named columns, seeking past the others (from `f` if given, a file opened on the segment)."""
+        result = {}
+        with (open(self.path, 'rb') if f is None else f) as f:
+            offset = SEGMENT_HEADER.size
+            for name, typecode in COLUMNS:
+                column = array(typecode)
+                if name in names:
+                    f.seek(offset)
+                    column.fromfile(f, self.rows)
+                    if _SWAP:
+                        column.byteswap()
+                    result[name] = column
+                offset += column.itemsize * self.rows
+        return result
+
+
+# =============================================================================
+# ROLLUP STORE
+# =============================================================================
+
+def _merge(agg, other):
+    """Combine two bucket aggregates [count, sum, min, max, last]; `other` is the newer one."""
+    agg[0] += other[0]
+    agg[1] += other[1]
+    agg[2] = min(agg[2], other[2])
+    agg[3] = max(agg[3], other[3])
+    agg[4] = other[4]
+
+
+def _aggregate(agg, how):
+    count, total, low, high, last = agg
+    if how == 'avg':
+        return total / count if count else math.nan
+    return {'sum': total, 'count': count, 'min': low, 'max': high, 'last': last}[how]
+
+
+class RollupStore:
+    """
+    Downsamples incoming samples into per-resolution buckets.
+
+    Buckets stay in memory until they are closed (the newest sample seen is past
+    the bucket end plus a grace period for late samples), then are flushed to a
+    segment. A bucket row that arrives after its bucket was flushed is written to a
+    later segment and merged at query time and during compaction.
+    """
+
+    def __init__(self, data_dir, grace_ms=120000, resolutions=None):
+        self.data_dir = data_dir
+        self.grace_ms = grace_ms
+        self.resolutions = resolutions or RESOLUTIONS
+        self._lock = threading.RLock()
+        self._series_path = os.path.join(data_dir, 'series.json')
+        self._series_labels = []
+        self._series_ids = {}
+        self._series_dirty = False
+        self._open = {name: {} for name in self.resolutions}
+        self._segments = {name: [] for name in self.resolutions}
+        self._segment_seq = 0
+        self.max_timestamp = 0
+        self.samples_ingested = 0
+        self._load()
+
+    def _load(self):
+        for name in self.resolutions:
+            os.makedirs(os.path.join(self.data_dir, name), exist_ok=True)
+        if os.path.exists(self._series_path):
+            with open(self._series_path) as f:
+                self._series_labels = json.load(f)
+            self._series_ids = {self._series_key(labels): i for i, labels in enumerate(self._series_labels)}
+        for name in self.resolutions:
+            directory = os.path.join(self.data_dir, name)
+            for filename in sorted(os.listdir(directory)):
+                if filename.endswith('.col'):
+                    segment = Segment.open(os.path.join(directory, filename))
+                    self._segments[name].append(segment)
+                    self._segment_seq = max(self._segment_seq, int(filename.split('-')[-1][:-4]) + 1)
+                    self.max_timestamp = max(self.max_timestamp, segment.max_bucket)
+
+    @staticmethod
+    def _series_key(labels):
+        return tuple(sorted(labels.items()))
+
+    def _series_id(self, labels):
+        key = self._series_key(labels)
+        series_id = self._series_ids.get(key)
+        if series_id is None:
+            series_id = self._series_ids[key] = len(self._series_labels)
+            self._series_labels.append(dict(labels))
+            self._series_dirty = True
+        return series_id
+
+    @property
+    def series_count(self):
+        return len(self._series_labels)
+
+    def ingest(self, timeseries):
+        """Add decoded [(labels, [(value, timestamp), ...]), ...] to the open buckets."""
+        steps = [(self._open[name], step) for name, (step, _) in self.resolutions.items()]
+        with self._lock:
+            for labels, samples in timeseries:
+                if not samples:
+                    continue
+                series_id = self._series_id(labels)
+                for value, timestamp in samples:
+                    if math.isnan(value):  # Staleness markers and NaN samples carry no data
+                        continue
+                    self.samples_ingested += 1
+                    if timestamp > self.max_timestamp:
+                        self.max_timestamp = timestamp
+                    for buckets, step in steps:
+                        key = (series_id, timestamp - timestamp % step)
+                        agg = buckets.get(key)
+                        if agg is None:
+                            buckets[key] = [1, value, value, value, value, timestamp]
+                        else:
+                            agg[0] += 1
+                            agg[1] += value
+                            if value < agg[2]:
+                                agg[2] = value
+                            if value > agg[3]:
+                                agg[3] = value
+                            if timestamp >= agg[5]:
+                                agg[4] = value
+                                agg[5] = timestamp
+
+    def flush(self, force=False):
+        """Write closed buckets (all buckets if force) to new segments; returns rows written."""
+        written = 0
+        with self._lock:
+            if self._series_dirty:
+                tmp_path = self._series_path + '.tmp'
+                with open(tmp_path, 'w') as f:
+                    json.dump(self._series_labels, f)
+                os.replace(tmp_path, self._series_path)
+                self._series_dirty = False
+            for name, (step, _) in self.resolutions.items():
+                buckets = self._open[name]
+                closed = [
+                    key for key in buckets
+                    if force or key[1] + step + self.grace_ms <= self.max_timestamp
+                ]
+                if not closed:
+                    continue
+                rows = [key + tuple(buckets.pop(key)[:5]) for key in closed]
+                self._segments[name].append(self._write(name, rows))
+                written += len(rows)
+        return written
+
+    def _write(self, name, rows):
+        path = os.path.join(self.data_dir, name, f"seg-{self._segment_seq:010d}.col")
+        self._segment_seq += 1
+        return write_segment(path, rows)
+
+    def compact(self):
+        """Merge the segments of each fully closed block window into one segment."""
+        merged = 0
+        with self._lock:
+            for name, (step, block) in self.resolutions.items():
+                groups = {}
+                for segment in self._segments[name]:
+                    window = segment.min_bucket - segment.min_bucket % block
+                    if segment.max_bucket < window + block:  # Segment fits in one window
+                        groups.setdefault(window, []).append(segment)
+                for window, segments in groups.items():
+                    if len(segments) < 2 or window + block + step + self.grace_ms > self.max_timestamp:
+                        continue
+                    rows = {}
+                    for segment in segments:  # In write order, so later rows win 'last'
+                        self._merge_rows(rows, segment, ('count', 'sum', 'min', 'max', 'last'), None, None, None)
+                    new = self._write(name, [key + tuple(agg) for key, agg in rows.items()])
+                    for segment in segments:
+                        self._segments[name].remove(segment)
+                        os.remove(segment.path)
+                    self._segments[name].append(new)
+                    merged += len(segments)
+        return merged
+
+    @staticmethod
+    def _merge_rows(rows, segment, columns, series_ids, start, end, f=None):
+        """
+        Merge a segment's rows into `rows`. With series_ids (sorted) and a bucket range,
+        only those series' rows in the range are visited: segment rows are sorted by
+        (series_id, bucket), so each series' run and time range is found by bisection.
+        """
+        data = segment.read_columns(('series_id', 'bucket') + tuple(columns), f)
+        empty = array('d', bytes(8 * segment.rows)) if len(columns) < 5 else None
+        count = data.get('count') or array('I', bytes(4 * segment.rows))
+        total = data.get('sum') or empty
+        low = data.get('min') or empty
+        high = data.get('max') or empty
+        last = data.get('last') or empty
+        ids, buckets = data['series_id'], data['bucket']
+        if series_ids is None:
+            selected = range(segment.rows)
+        else:
+            selected = []
+            for series_id in series_ids:
+                lo = bisect_left(ids, series_id)
+                hi = bisect_right(ids, series_id, lo)
+                if lo < hi:
+                    selected.append(range(bisect_left(buckets, start, lo, hi), bisect_right(buckets, end, lo, hi)))
+            selected = (i for run in selected for i in run)
+        for i in selected:
+            agg = [count[i], total[i], low[i], high[i], last[i]]
+            key = (ids[i], buckets[i])
+            if key in rows:
+                _merge(rows[key], agg)
+            else:
+                rows[key] = agg
+
+    def label_names(self):
+        with self._lock:
+            return sorted({name for labels in self._series_labels for name in labels})
+
+    def label_values(self, name):
+        with self._lock:
+            return sorted({labels[name] for labels in self._series_labels if name in labels})
+
+    def series(self, matchers):
+        with self._lock:
+            return [labels for labels in self._series_labels if matches(labels, matchers)]
+
+    def query_range(self, matchers, start_ms, end_ms, resolution='5m', aggregation='avg'):
+        """Return [(labels, [(bucket start ms, value), ...]), ...] for matching series."""
+        if resolution not in self.resolutions:
+            raise ValueError(f"unknown resolution {resolution!r}")
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"unknown aggregation {aggregation!r}")
+        step = self.resolutions[resolution][0]
+        start_bucket = start_ms - start_ms % step
+        # Series labels are append-only, so matching runs on a snapshot without the lock
+        with self._lock:
+            series_labels = self._series_labels[:]
+        series_ids = sorted(i for i, labels in enumerate(series_labels) if matches(labels, matchers))
+        if not series_ids:
+            return []
+        wanted = set(series_ids)
+
+        # Only the snapshot is taken under the lock. The segment files are opened here
+        # so that compaction, which unlinks merged segments, cannot pull them away.
+        files = []
+        try:
+            with self._lock:
+                for segment in self._segments[resolution]:
+                    if segment.max_bucket >= start_bucket and segment.min_bucket <= end_ms:
+                        files.append((segment, open(segment.path, 'rb')))
+                open_buckets = [
+                    (key, agg[:5]) for key, agg in self._open[resolution].items()
+                    if key[0] in wanted and start_bucket <= key[1] <= end_ms
+                ]
+            rows = {}
+            for segment, f in files:  # In write order, so later rows win 'last'
+                self._merge_rows(rows, segment, AGGREGATION_COLUMNS[aggregation], series_ids, start_bucket, end_ms, f)
+        finally:
+            for _, f in files:
+                f.close()
+        for key, agg in open_buckets:
+            if key in rows:
+                _merge(rows[key], list(agg))
+            else:
+                rows[key] = list(agg)
+
+        result = {}
+        for (series_id, bucket), agg in sorted(rows.items()):
+            result.setdefault(series_id, []).append((bucket, _aggregate(agg, aggregation)))
+        return [(series_labels[series_id], points) for series_id, points in result.items()]
+
+
+# =============================================================================
+# HTTP API
+# =============================================================================
+
+def choose_resolution(step_seconds, resolutions=RESOLUTIONS):
+    """Pick the coarsest resolution not wider than the query step (finest if none)."""
+    candidates = sorted(resolutions.items(), key=lambda kv: kv[1][0])
+    chosen = candidates[0][0]
+    for name, (width, _) in candidates:
+        if width <= step_seconds * 1000:
+            chosen = name
+    return chosen
+
+
+class ReceiverHTTPRequestHandler(BaseHTTPRequestHandler):
+    store = None  # Set by make_server()
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error_json(self, status, error_type, message):
+        self._send_json(status, {'status': 'error', 'errorType': error_type, 'error': message})
+
+    def _params(self):
+        params = parse_qs(urlparse(self.path).query)
+        if self.command == 'POST' and self.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+            length = int(self.headers.get('Content-Length', 0))
+            for key, values in parse_qs(self.rfile.read(length).decode()).items():
+                params.setdefault(key, []).extend(values)
+        return params
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        if path == '/api/v1/write':
+            self._handle_write()
+        elif path.startswith('/api/v1/'):
+            self.do_GET()
+        else:
+            self._send_error_json(404, 'not_found', f"unknown path {path}")
+
+    def _handle_write(self):
+        compressed = self.headers.get('Content-Encoding', 'snappy') == 'snappy'
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            self._send_error_json(400, 'bad_data', "invalid Content-Length")
+            return
+        # Checked before reading: the decompressed size limit alone would buffer any body first
+        limit = MAX_COMPRESSED_WRITE_REQUEST_BYTES if compressed else MAX_WRITE_REQUEST_BYTES
+        if length > limit:
+            logger.warning(f"Rejected remote write from {self.client_address[0]}: body of {length} bytes")
+            self.close_connection = True  # The unread body must not be parsed as the next request
+            self._send_error_json(413, 'bad_data', f"request body of {length} bytes exceeds the {limit} byte limit")
+            return
+        body = self.rfile.read(length)
+        try:
+            if compressed:
+                body = snappy_decompress(body)
+            timeseries = decode_write_request(body)
+        except (DecodeError, UnicodeDecodeError, struct.error) as e:
+            logger.warning(f"Rejected remote write from {self.client_address[0]}: {e}")
+            self._send_error_json(400, 'bad_data', str(e))
+            return
+        self.store.ingest(timeseries)
+        self.send_response(204)
+        self.end_headers()
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        try:
+            params = self._params()
+            if path == '/api/v1/query_range':
+                self._handle_query_range(params)
+            elif path == '/api/v1/query':
+                self._handle_query(params)
+            elif path == '/api/v1/labels':
+                self._send_json(200, {'status': 'success', 'data': self.store.label_names()})
+            elif path.startswith('/api/v1/label/') and path.endswith('/values'):
+                name = path[len('/api/v1/label/'):-len('/values')]
+                self._send_json(200, {'status': 'success', 'data': self.store.label_values(name)})
+            elif path == '/api/v1/series':
+                result = []
+                for selector in params.get('match[]', []):
+                    result.extend(self.store.series(parse_selector(selector)))
+                self._send_json(200, {'status': 'success', 'data': result})
+            elif path == '/api/v1/metadata':
+                self._send_json(200, {'status': 'success', 'data': {}})
+            elif path == '/api/v1/status/buildinfo':
+                self._send_json(200, {'status': 'success', 'data': {'version': '2.47.0', 'application': 'remote-write-receiver'}})
+            elif path == '/health':
+                self._send_json(200, {'status': 'healthy'})
+            elif path == '/metrics':
+                self._handle_metrics()
+            else:
+                self._send_error_json(404, 'not_found', f"unknown path {path}")
+        except ValueError as e:
+            self._send_error_json(400, 'bad_data', str(e))
+
+    @staticmethod
+    def _param(params, name, default=None):
+        values = params.get(name)
+        if values:
+            return values[0]
+        if default is None:
+            raise ValueError(f"missing parameter {name!r}")
+        return default
+
+    def _handle_query(self, params):
+        """Instant query: a numeric constant, or the latest rollup bucket of each matching series."""
+        expression = self._param(params, 'query')
+        at = float(self._param(params, 'time', str(time.time())))
+        constant = evaluate_constant(expression)
+        if constant is not None:
+            self._send_json(200, {'status': 'success', 'data': {'resultType': 'scalar', 'result': [at, repr(constant)]}})
+            return
+        matchers = parse_selector(expression)
+        resolution = self._param(params, 'resolution', min(RESOLUTIONS, key=lambda name: RESOLUTIONS[name][0]))
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"unknown resolution {resolution!r}")
+        at_ms = int(at * 1000)
+        # Like Prometheus' lookback, the newest bucket that started within one bucket width
+        result = self.store.query_range(matchers, at_ms - RESOLUTIONS[resolution][0], at_ms, resolution,
+                                        self._param(params, 'agg', 'avg'))
+        self._send_json(200, {
+            'status': 'success',
+            'data': {
+                'resultType': 'vector',
+                'result': [{'metric': labels, 'value': [at, repr(float(points[-1][1]))]} for labels, points in result],
+            },
+        })
+
+    def _handle_query_range(self, params):
+        matchers = parse_selector(self._param(params, 'query'))
+        start_ms = int(float(self._param(params, 'start')) * 1000)
+        end_ms = int(float(self._param(params, 'end')) * 1000)
+        resolution = params.get('resolution', [None])[0] or choose_resolution(float(self._param(params, 'step', '300')))
+        aggregation = self._param(params, 'agg', 'avg')
+        result = self.store.query_range(matchers, start_ms, end_ms, resolution, aggregation)
+        self._send_json(200, {
+            'status': 'success',
+            'data': {
+                'resultType': 'matrix',
+                'result': [
+                    {
+                        'metric': labels,
+                        'values': [[bucket / 1000, repr(float(value))] for bucket, value in points],
+                    }
+                    for labels, points in result
+                ],
+            },
+        })
+
+    def _handle_metrics(self):
+        store = self.store
+        metrics = f"""# HELP remote_write_receiver_samples_ingested_total Samples accepted from remote write
+# TYPE remote_write_receiver_samples_ingested_total counter
+remote_write_receiver_samples_ingested_total {store.samples_ingested}
+# HELP remote_write_receiver_series Known series
+# TYPE remote_write_receiver_series gauge
+remote_write_receiver_series {store.series_count}
+"""
+        body = metrics.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Override to use logging instead of print"""
+        logger.debug(f"HTTP: {format % args}")
+
+
+def make_server(host, port, store):
+    handler = type('BoundReceiverHTTPRequestHandler', (ReceiverHTTPRequestHandler,), {'store': store})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def _maintenance_loop(store, interval, stop):
+    while not stop.wait(interval):
+        try:
+            written = store.flush()
+            merged = store.compact()
+            if written or merged:
+                logger.info(f"Flushed {written} rollup rows, compacted {merged} segments")
+        except OSError as e:
+            logger.error(f"Rollup flush failed: {e}")
+
+
+def main():
+    """Main function to start the receiver"""
+    host = os.environ.get('RECEIVER_BIND_ADDRESS', '0.0.0.0')
+    port = int(os.environ.get('RECEIVER_PORT', 9201))
+    data_dir = os.environ.get('RECEIVER_DATA_DIR', '/var/lib/remote-write-receiver')
+    flush_interval = float(os.environ.get('RECEIVER_FLUSH_INTERVAL', 60))
+    grace_seconds = float(os.environ.get('RECEIVER_GRACE_SECONDS', 120))
+    log_file = os.environ.get('RECEIVER_LOG_FILE')
+
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=handlers
+    )
+
+    store = RollupStore(data_dir, grace_ms=int(grace_seconds * 1000))
+    stop = threading.Event()
+    maintenance = threading.Thread(target=_maintenance_loop, args=(store, flush_interval, stop), daemon=True)
+    maintenance.start()
+
+    # Exit through the finally block on SIGTERM so open buckets are flushed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    try:
+        with make_server(host, port, store) as httpd:
+            logger.info(f"Remote write receiver starting on {host}:{port} (data: {data_dir})")
+            logger.info("  POST /api/v1/write - Prometheus remote write")
+            logger.info("  GET  /api/v1/query_range - Range queries over 5m/1h rollups")
+            logger.info("  GET  /api/v1/query - Instant queries (latest rollup bucket)")
+            httpd.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down remote write receiver...")
+    finally:
+        stop.set()
+        store.flush(force=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Synthetic-inventory benchmark for inventory-wide template rendering.
+
+Compares, at several fleet sizes, the per-host group/hostvars loops the templates
+used to do with the precomputed inventory index (filter_plugins/inventory_index.py):
+
+  hosts.j2       /etc/hosts rendered on every node (whole fleet)
+  membership     the five group checks of monitoring_check.yml on every node
+  prometheus     prometheus.yml.j2 rendered once (scrape target lists)
+
+Templates are rendered with Jinja2 directly (no Ansible run). hostvars is a mapping
+that merges group and host variables on every access, which is a lower bound on
+what Ansible's HostVars does, so real-world savings are larger than reported.
+Per-host renders are timed on a sample of hosts and scaled to the fleet size.
+
+Usage:
+    python3 scripts/bench_inventory_render.py
+    python3 scripts/bench_inventory_render.py --sizes 10 100 1000 5000 --sample 25 --json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import jinja2
+import yaml
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(REPO_ROOT, 'filter_plugins'))
+
+import inventory_index  # noqa: E402
+import prometheus_sharding  # noqa: E402
+
+DEFAULT_SIZES = (10, 100, 1000, 5000)
+GROUP_SHARE = (('app_servers', 0.6), ('database_servers', 0.3), ('monitoring_servers', 0.1))
+
+LEGACY_HOSTS_TEMPLATE = """# Ansible managed hosts
+{% for host in groups['all'] %}
+{{ hostvars[host]['internal_ip'] | default(hostvars[host]['ansible_host']) }} {{ host }}
+{% endfor %}"""
+
+LEGACY_PROMETHEUS_TEMPLATE = """scrape_configs:
+  - job_name: 'node-exporter-app-servers'
+    static_configs:
+      - targets:
+{% for host in groups['app_servers'] %}
+        - '{{ hostvars[host]['ansible_host'] }}:9100'
+{% endfor %}
+  - job_name: 'node-exporter-database-servers'
+    static_configs:
+      - targets:
+{% for host in groups['database_servers'] %}
+        - '{{ hostvars[host]['ansible_host'] }}:9100'
+{% endfor %}
+  - job_name: 'mock-service'
+    static_configs:
+      - targets:
+{% for host in groups['app_servers'] %}
+        - '{{ hostvars[host]['ansible_host'] }}:8080'
+{% endfor %}"""
+
+LEGACY_MEMBERSHIP = [f"inventory_hostname in groups['{group}']" for group in
+                     ('app_servers', 'database_servers', 'node_exporters', 'monitoring_servers', 'monitoring_servers')]
+INDEXED_MEMBERSHIP = [f"'{group}' in group_names" for group in
+                      ('app_servers', 'database_servers', 'node_exporters', 'monitoring_servers', 'monitoring_servers')]
+
+
+class SyntheticHostVars:
+    """hostvars stand-in: every lookup merges group vars and host vars, like variable resolution does."""
+
+    def __init__(self, group_vars, host_vars, host_groups):
+        self._group_vars = group_vars
+        self._host_vars = host_vars
+        self._host_groups = host_groups
+
+    def __getitem__(self, host):
+        merged = {}
+        for group in self._host_groups[host]:
+            merged.update(self._group_vars[group])
+        merged.update(self._host_vars[host])
+        return merged
+
+    def __contains__(self, host):
+        return host in self._host_vars
+
+
+def synthetic_inventory(size):
+    """Return (groups, hostvars, host_groups) for a fleet of `size` hosts."""
+    groups = {'all': [], 'ungrouped': []}
+    host_groups = {}
+    host_vars = {}
+    group_vars = {'all': {f'all_var_{i}': i for i in range(20)}}
+    for group, share in GROUP_SHARE:
+        count = max(1, int(size * share))
+        group_vars[group] = {f'{group}_var_{i}': i for i in range(10)}
+        groups[group] = []
+        for i in range(count):
+            host = f"{group.split('_')[0]}-{i:05d}"
+            n = len(groups['all'])
+            groups[group].append(host)
+            groups['all'].append(host)
+            host_groups[host] = ['all', group]
+            host_vars[host] = {
+                'ansible_host': f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}",
+                'internal_ip': f"192.168.{n >> 8 & 255}.{n & 255}",
+                'ansible_port': 22,
+            }
+    groups['node_exporters'] = groups['app_servers'] + groups['database_servers']
+    group_vars['node_exporters'] = {}
+    for host in groups['node_exporters']:
+        host_groups[host].append('node_exporters')
+    return groups, SyntheticHostVars(group_vars, host_vars, host_groups), host_groups
+
+
+def make_environment():
+    loader = jinja2.FileSystemLoader([
+        os.path.join(REPO_ROOT, 'roles', 'common', 'templates'),
+        os.path.join(REPO_ROOT, 'roles', 'prometheus', 'templates'),
+    ])
+    env = jinja2.Environment(loader=loader, trim_blocks=True)  # trim_blocks matches Ansible's template module
+    env.filters.update(inventory_index.FilterModule().filters())
+    env.filters.update(prometheus_sharding.FilterModule().filters())
+    env.filters['bool'] = lambda value: str(value).lower() in ('1', 'true', 'yes', 'on')
+    env.filters['combine'] = lambda a, b: {**a, **b}
+    env.filters['to_nice_yaml'] = lambda data, indent=2: yaml.safe_dump(data, indent=indent, default_flow_style=False)
+    return env
+
+
+def _timed(func):
+    started = time.perf_counter()
+    result = func()
+    return time.perf_counter() - started, result
+
+
+def _per_host(render, hosts, sample):
+    """Time render(host) on a sample of hosts and scale to the whole list."""
+    sampled = hosts[::max(1, len(hosts) // sample)][:sample]
+    elapsed, _ = _timed(lambda: [render(host) for host in sampled])
+    return elapsed * len(hosts) / len(sampled)
+
+
+def bench_size(env, size, sample, shard_size):
+    groups, hostvars, host_groups = synthetic_inventory(size)
+    hosts = groups['all']
+    context = {'groups': groups, 'hostvars': hostvars, 'ansible_hostname': 'node', 'prometheus_remote_write': []}
+
+    legacy_hosts = env.from_string(LEGACY_HOSTS_TEMPLATE)
+    legacy_prometheus = env.from_string(LEGACY_PROMETHEUS_TEMPLATE)
+    hosts_template = env.get_template('hosts.j2')
+    prometheus_template = env.get_template('prometheus.yml.j2')
+    legacy_checks = [env.compile_expression(expr) for expr in LEGACY_MEMBERSHIP]
+    indexed_checks = [env.compile_expression(expr) for expr in INDEXED_MEMBERSHIP]
+
+    index_seconds, index = _timed(lambda: inventory_index.inventory_index(groups, hostvars))
+    target_index_seconds, target_index = _timed(
+        lambda: inventory_index.inventory_index(groups, hostvars, ['ansible_host']))
+
+    legacy_prometheus_seconds, _ = _timed(lambda: legacy_prometheus.render(context))
+    prometheus_seconds, _ = _timed(lambda: prometheus_template.render(
+        context, prometheus_inventory_index=target_index, prometheus_scrape_shard_size=shard_size))
+
+    return {
+        'hosts': len(hosts),
+        'index_build_seconds': index_seconds + target_index_seconds,
+        'hosts_file': {
+            'legacy_seconds': _per_host(lambda host: legacy_hosts.render(context), hosts, sample),
+            'indexed_seconds': _per_host(
+                lambda host: hosts_template.render(context, inventory_index=index), hosts, sample),
+        },
+        'membership': {
+            'legacy_seconds': _per_host(
+                lambda host: [check(groups=groups, inventory_hostname=host) for check in legacy_checks],
+                hosts, sample),
+            'indexed_seconds': _per_host(
+                lambda host: [check(group_names=host_groups[host][1:]) for check in indexed_checks],
+                hosts, sample),
+        },
+        'prometheus': {
+            'legacy_seconds': legacy_prometheus_seconds,
+            'indexed_seconds': prometheus_seconds + target_index_seconds,
+        },
+    }
+
+
+def format_text(results):
+    lines = [f"{'hosts':>6}  {'index':>8}  {'hosts.j2 legacy':>16}  {'hosts.j2 index':>15}  "
+             f"{'checks legacy':>14}  {'checks index':>13}  {'prom legacy':>12}  {'prom index':>11}"]
+    for r in results:
+        lines.append(
+            f"{r['hosts']:>6}  {r['index_build_seconds']:>7.3f}s  "
+            f"{r['hosts_file']['legacy_seconds']:>15.3f}s  {r['hosts_file']['indexed_seconds']:>14.3f}s  "
+            f"{r['membership']['legacy_seconds']:>13.3f}s  {r['membership']['indexed_seconds']:>12.3f}s  "
+            f"{r['prometheus']['legacy_seconds']:>11.3f}s  {r['prometheus']['indexed_seconds']:>10.3f}s"
+        )
+    lines.append("hosts.j2 and checks: whole-fleet totals (one render per host); prom: one render incl. index build")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark inventory-wide template rendering on synthetic fleets.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help="Fleet sizes")
+    parser.add_argument('--sample', type=int, default=25, help="Hosts rendered per size for per-host timings")
+    parser.add_argument('--shard-size', type=int, default=1000, help="prometheus_scrape_shard_size")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    env = make_environment()
+    results = [bench_size(env, size, args.sample, args.shard_size) for size in args.sizes]
+    print(json.dumps(results, indent=2) if args.json else format_text(results))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Streaming parser and validator for the Prometheus text exposition format.
+
+The payload is consumed incrementally as bytes (only the current partial line is
+buffered), so multi-megabyte exporter output can be validated straight from the
+HTTP response. Checks:
+  - metric name and label syntax, sample values and timestamps
+  - HELP/TYPE consistency (one of each per family, declared before the samples)
+  - families are contiguous (all samples of a family appear together)
+  - duplicate series (same metric name and label set)
+  - histogram buckets: increasing 'le', non-decreasing counts, a '+Inf' bucket
+    that matches '_count'
+and reports per-family series counts (every bucket, quantile, _sum and _count
+sample is its own series, as in the TSDB).
+
+Library usage (e.g. from the testinfra suites):
+    report = validate_text(host.run("curl -s http://localhost:9100/metrics").stdout)
+    assert report['errors'] == []
+
+CLI usage:
+    scripts/exposition.py http://localhost:9100/metrics
+    scripts/exposition.py metrics.txt --json
+
+Exit codes: 0 valid, 1 validation errors, 2 payload could not be read.
+"""
+import argparse
+import json
+import math
+import re
+import sys
+import time
+import urllib.error
+import urllib.request
+
+METRIC_TYPES = frozenset(('counter', 'gauge', 'histogram', 'summary', 'untyped'))
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_ERRORS = 100
+
+_METRIC_NAME_RE = re.compile(r'[a-zA-Z_:][a-zA-Z0-9_:]*\Z')
+_LABEL_NAME = r'[a-zA-Z_][a-zA-Z0-9_]*'
+_LABEL_VALUE = r'"[^"\\\n]*(?:\\.[^"\\\n]*)*"'
+_LABEL = rf'{_LABEL_NAME}={_LABEL_VALUE}'
+_LABEL_WS = rf'[ \t]*{_LABEL_NAME}[ \t]*=[ \t]*{_LABEL_VALUE}[ \t]*'
+_LABEL_PAIR_RE = re.compile(rf'({_LABEL_NAME})[ \t]*=[ \t]*"([^"\\\n]*(?:\\.[^"\\\n]*)*)"')
+# Whole sample line in one pass: name, optional label set (syntax-checked), value, optional timestamp.
+# The canonical form exporters emit is tried first; the whitespace-tolerant form is the fallback.
+_SAMPLE_RE = re.compile(
+    rf'([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{{((?:{_LABEL}(?:,{_LABEL})*,?)?)\}})? (\S+)(?: (\S+))?\Z'
+)
+_SAMPLE_WS_RE = re.compile(
+    rf'([a-zA-Z_:][a-zA-Z0-9_:]*)[ \t]*(?:\{{((?:{_LABEL_WS}(?:,{_LABEL_WS})*,?)?[ \t]*)\}})?'
+    rf'[ \t]+(\S+)(?:[ \t]+(\S+))?[ \t]*\Z'
+)
+_TIMESTAMP_RE = re.compile(r'-?[0-9]+\Z')
+_SUFFIXES = {
+    'histogram': ('_bucket', '_count', '_sum'),
+    'summary': ('_count', '_sum'),
+}
+
+
+class ExpositionValidator:
+    """
+    Incremental validator: feed() raw byte chunks as they arrive, then close().
+
+    Families must be contiguous in valid exposition, so per-family state (histogram
+    buckets, series keys) is only kept for the family currently being parsed.
+    """
+
+    def __init__(self, max_errors=DEFAULT_MAX_ERRORS):
+        self.max_errors = max_errors
+        self.errors = []
+        self.lines = 0
+        self.samples = 0
+        self.families = {}        # name -> {'type', 'help', 'series'}
+        self._pending = b''
+        self._types = {}          # family name -> declared type
+        self._helps = set()
+        self._closed = set()      # families whose samples are complete
+        self._current = None      # family currently receiving samples
+        self._series = set()      # series keys seen in the current family
+        self._buckets = {}        # histogram series (labels without le) -> [(le, count), ...]
+        self._counts = {}         # histogram series -> _count value
+        self._current_family = None
+        self._resolved = {}       # sample name -> (family name, suffix)
+
+    # -- input ---------------------------------------------------------------
+
+    def feed(self, chunk):
+        """Consume a chunk of bytes; complete lines are validated immediately."""
+        data = self._pending + chunk if self._pending else chunk
+        end = data.rfind(b'\n')
+        if end < 0:
+            self._pending = data
+            return
+        self._pending = data[end + 1:]
+        self._process(data[:end].decode('utf-8', errors='replace').split('\n'))
+
+    def close(self):
+        """Flush the trailing line and return the report."""
+        if self._pending:
+            self._process([self._pending.decode('utf-8', errors='replace')])
+            self._pending = b''
+        self._finish_family()
+        return self.report()
+
+    def report(self):
+        return {
+            'valid': not self.errors,
+            'errors': list(self.errors),
+            'lines': self.lines,
+            'samples': self.samples,
+            'series': sum(f['series'] for f in self.families.values()),
+            'families': {
+                name: dict(family)
+                for name, family in sorted(self.families.items(), key=lambda kv: kv[1]['series'], reverse=True)
+            },
+        }
+
+    # -- parsing -------------------------------------------------------------
+
+    def _error(self, message):
+        if len(self.errors) < self.max_errors:
+            self.errors.append(f"line {self.lines}: {message}")
+
+    def _process(self, lines):
+        # Hot loop: everything per-line is bound to locals; family switches and
+        # histogram samples are rare enough to go through methods.
+        sample_match = _SAMPLE_RE.match
+        label_pairs = _LABEL_PAIR_RE.findall
+        resolved = self._resolved
+        series = self._series
+        first_line = self.lines
+        for index, line in enumerate(lines, 1):
+            if not line:
+                continue
+            if line[0] == '#':
+                self.lines = first_line + index
+                self._comment(line)
+                continue
+
+            match = sample_match(line) or _SAMPLE_WS_RE.match(line)
+            if match is None:
+                self.lines = first_line + index
+                self._error(f"malformed sample line: {line[:80]!r}")
+                continue
+            name, raw_labels, raw_value, timestamp = match.groups()
+            try:
+                value = float(raw_value)
+            except ValueError:
+                self.lines = first_line + index
+                self._error(f"invalid value for {name}: {raw_value!r}")
+                continue
+            if timestamp is not None and not _TIMESTAMP_RE.match(timestamp):
+                self.lines = first_line + index
+                self._error(f"invalid timestamp for {name}: {timestamp!r}")
+                continue
+
+            if raw_labels:
+                labels = label_pairs(raw_labels)
+                if len(labels) > 1:
+                    labels.sort()
+                    if len(dict(labels)) != len(labels):
+                        self.lines = first_line + index
+                        self._error(f"duplicate label name in {name}{{{raw_labels}}}")
+                        continue
+                labels = tuple(labels)
+            else:
+                labels = ()
+
+            family_name, suffix = resolved.get(name) or self._resolve(name)
+            if family_name != self._current:
+                self.lines = first_line + index
+                self._start_family(family_name)
+                series = self._series
+
+            key = (name, labels)
+            if key in series:
+                self.lines = first_line + index
+                self._error(f"duplicate series {name}{{{raw_labels or ''}}}")
+                continue
+            series.add(key)
+            self.samples += 1
+
+            self._current_family['series'] += 1
+            if suffix is not None and self._current_family['type'] == 'histogram':
+                self.lines = first_line + index
+                self._histogram_sample(name, suffix, labels, value)
+        self.lines = first_line + len(lines)
+
+    def _comment(self, line):
+        parts = line.split(None, 3)
+        if len(parts) < 3 or parts[1] not in ('HELP', 'TYPE'):
+            return  # Plain comment
+        kind, name = parts[1], parts[2]
+        if not _METRIC_NAME_RE.match(name):
+            self._error(f"invalid metric name in {kind}: {name!r}")
+            return
+        if name == self._current or name in self._closed:
+            self._error(f"{kind} for {name} after its samples")
+        if kind == 'HELP':
+            if name in self._helps:
+                self._error(f"duplicate HELP for {name}")
+            self._helps.add(name)
+            self._family(name)['help'] = parts[3] if len(parts) > 3 else ''
+            return
+        metric_type = parts[3].strip() if len(parts) > 3 else ''
+        if metric_type not in METRIC_TYPES:
+            self._error(f"invalid TYPE for {name}: {metric_type!r}")
+            return
+        if name in self._types:
+            self._error(f"duplicate TYPE for {name}")
+        self._types[name] = metric_type
+        self._family(name)['type'] = metric_type
+
+    def _family(self, name):
+        family = self.families.get(name)
+        if family is None:
+            family = self.families[name] = {'type': 'untyped', 'help': None, 'series': 0}
+        return family
+
+    def _family_name(self, name):
+        """Map a sample name to its family (histogram/summary suffixes belong to the base name)."""
+        if name in self._types:
+            return name, None
+        for suffix in ('_bucket', '_count', '_sum'):
+            if name.endswith(suffix):
+                base = name[:-len(suffix)]
+                if suffix in _SUFFIXES.get(self._types.get(base), ()):
+                    return base, suffix
+        return name, None
+
+    def _resolve(self, name):
+        resolved = self._resolved[name] = self._family_name(name)
+        return resolved
+
+    def _start_family(self, name):
+        self._finish_family()
+        if name in self._closed:
+            self._error(f"samples for {name} are not contiguous")
+        self._current = name
+        self._current_family = self._family(name)
+
+    def _histogram_sample(self, name, suffix, labels, value):
+        if suffix == '_bucket':
+            le = None
+            series = []
+            for label in labels:
+                if label[0] == 'le':
+                    le = label[1]
+                else:
+                    series.append(label)
+            if le is None:
+                self._error(f"{name} without 'le' label")
+                return
+            try:
+                bound = float(le)
+            except ValueError:
+                self._error(f"invalid 'le' value for {name}: {le!r}")
+                return
+            series = tuple(series)
+            buckets = self._buckets.get(series)
+            if buckets is None:
+                buckets = self._buckets[series] = []
+            elif bound <= buckets[-1][0]:
+                self._error(f"{name} buckets not in increasing 'le' order at le={le}")
+            elif value < buckets[-1][1]:
+                self._error(f"{name} bucket counts decrease at le={le}")
+            buckets.append((bound, value))
+        elif suffix == '_count':
+            self._counts[labels] = value
+
+    def _finish_family(self):
+        name = self._current
+        if name is None:
+            return
+        for series, buckets in self._buckets.items():
+            labels = ','.join(f'{k}="{v}"' for k, v in series)
+            if buckets[-1][0] != math.inf:
+                self._error(f"{name}_bucket{{{labels}}} has no '+Inf' bucket")
+            elif series in self._counts and self._counts[series] != buckets[-1][1]:
+                self._error(f"{name}_count{{{labels}}} does not match its '+Inf' bucket")
+        self._closed.add(name)
+        self._current = None
+        self._series = set()
+        self._buckets = {}
+        self._counts = {}
+
+
+def validate_chunks(chunks, max_errors=DEFAULT_MAX_ERRORS):
+    """Validate an iterable of byte chunks."""
+    validator = ExpositionValidator(max_errors=max_errors)
+    for chunk in chunks:
+        validator.feed(chunk)
+    return validator.close()
+
+
+def validate_text(text, max_errors=DEFAULT_MAX_ERRORS):
+    """Validate an exposition payload that is already in memory (str or bytes)."""
+    if isinstance(text, str):
+        text = text.encode('utf-8')
+    return validate_chunks((text,), max_errors=max_errors)
+
+
+def iter_stream(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield byte chunks from a file-like object until EOF."""
+    read = stream.read
+    chunk = read(chunk_size)
+    while chunk:
+        yield chunk
+        chunk = read(chunk_size)
+
+
+def validate_url(url, timeout=10, chunk_size=DEFAULT_CHUNK_SIZE, max_errors=DEFAULT_MAX_ERRORS):
+    """Fetch an exporter endpoint and validate the response as it streams in."""
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return validate_chunks(iter_stream(response, chunk_size), max_errors=max_errors)
+
+
+def format_text(report, top=10):
+    lines = [
+        f"Lines: {report['lines']}  Samples: {report['samples']}  "
+        f"Series: {report['series']}  Families: {len(report['families'])}",
+    ]
+    if report['families']:
+        lines += ["", f"{'FAMILY':<60} {'TYPE':<10} {'SERIES':>8}"]
+        for name, family in list(report['families'].items())[:top]:
+            lines.append(f"{name:<60} {family['type']:<10} {family['series']:>8}")
+    if report['errors']:
+        lines += ["", "Errors:"] + [f"  {error}" for error in report['errors']]
+    else:
+        lines += ["", "Exposition is valid"]
+    return '\n'.join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Validate Prometheus text exposition from a URL or file.")
+    parser.add_argument('source', help="Metrics URL (http://...) or file path ('-' for stdin)")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    parser.add_argument('--top', type=int, default=10, help="Number of families to list, by series count")
+    parser.add_argument('--timeout', type=float, default=10, help="HTTP timeout in seconds")
+    parser.add_argument('--max-errors', type=int, default=DEFAULT_MAX_ERRORS, help="Stop recording errors after N")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    started = time.perf_counter()
+    try:
+        if args.source.startswith(('http://', 'https://')):
+            report = validate_url(args.source, timeout=args.timeout, max_errors=args.max_errors)
+        elif args.source == '-':
+            report = validate_chunks(iter_stream(sys.stdin.buffer), max_errors=args.max_errors)
+        else:
+            with open(args.source, 'rb') as f:
+                report = validate_chunks(iter_stream(f), max_errors=args.max_errors)
+    except (urllib.error.URLError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    report['elapsed_seconds'] = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_text(report, top=args.top))
+    return 0 if report['valid'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Scrape target health and cost report for a Prometheus server.
+
+Pulls /api/v1/targets, /api/v1/status/tsdb and the scrape_duration_seconds /
+scrape_samples_scraped series, then reports per-job and per-target scrape cost,
+targets that are close to their scrape timeout, and the most series-heavy metrics.
+
+Usage:
+    scripts/scrape_report.py --prometheus-url http://localhost:9090
+    scripts/scrape_report.py --fixtures tests/fixtures/prometheus --json
+    scripts/scrape_report.py --prometheus-url http://localhost:9090 --json --fail-on-near-timeout
+
+Exit codes: 0 OK, 1 gate failed (--fail-on-* options), 2 Prometheus could not be queried.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import urllib.error
+import urllib.parse
+import urllib.request
+
+# Snapshot keys and the API endpoint (and fixture file name) each one comes from
+ENDPOINTS = {
+    'targets': ('/api/v1/targets', {'state': 'active'}),
+    'tsdb': ('/api/v1/status/tsdb', {}),
+    'scrape_duration': ('/api/v1/query', {'query': 'scrape_duration_seconds'}),
+    'scrape_samples': ('/api/v1/query', {'query': 'scrape_samples_scraped'}),
+}
+
+DEFAULT_NEAR_TIMEOUT_RATIO = 0.8
+DEFAULT_TOP = 10
+
+_DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)(ms|y|w|d|h|m|s)')
+_DURATION_UNITS = {
+    'ms': 0.001, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800, 'y': 31536000,
+}
+
+
+class PrometheusAPIError(Exception):
+    """Raised when the Prometheus API cannot be queried or returns an error."""
+
+
+def parse_duration(value):
+    """Convert a Prometheus duration string (e.g. '15s', '1m30s', '500ms') to seconds."""
+    if not value:
+        return None
+    seconds = 0.0
+    pos = 0
+    for match in _DURATION_RE.finditer(value):
+        if match.start() != pos:
+            raise ValueError(f"Invalid duration: {value!r}")
+        seconds += float(match.group(1)) * _DURATION_UNITS[match.group(2)]
+        pos = match.end()
+    if pos != len(value):
+        raise ValueError(f"Invalid duration: {value!r}")
+    return seconds
+
+
+def fetch_json(base_url, path, params=None, timeout=10):
+    """GET a Prometheus API endpoint and return its 'data' payload."""
+    url = base_url.rstrip('/') + path
+    if params:
+        url += '?' + urllib.parse.urlencode(params)
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            payload = json.load(response)
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        raise PrometheusAPIError(f"GET {url} failed: {e}") from e
+    if payload.get('status') != 'success':
+        raise PrometheusAPIError(f"GET {url} returned {payload.get('errorType')}: {payload.get('error')}")
+    return payload['data']
+
+
+def load_snapshot_from_api(base_url, timeout=10):
+    """Collect all data needed for the report from a live Prometheus."""
+    return {
+        key: fetch_json(base_url, path, params, timeout=timeout)
+        for key, (path, params) in ENDPOINTS.items()
+    }
+
+
+def load_snapshot_from_fixtures(directory):
+    """
+    Load recorded API responses from a directory.
+
+    Each file is named after its snapshot key (targets.json, tsdb.json,
+    scrape_duration.json, scrape_samples.json) and contains the full API response.
+    Missing query fixtures are treated as empty results.
+    """
+    snapshot = {}
+    for key in ENDPOINTS:
+        path = os.path.join(directory, f"{key}.json")
+        if not os.path.exists(path):
+            if key in ('targets', 'tsdb'):
+                raise FileNotFoundError(path)
+            snapshot[key] = {'resultType': 'vector', 'result': []}
+            continue
+        with open(path) as f:
+            payload = json.load(f)
+        snapshot[key] = payload.get('data', payload)
+    return snapshot
+
+
+def _vector_by_target(query_data):
+    """Index an instant-vector query result by (job, instance)."""
+    values = {}
+    for series in query_data.get('result', []):
+        metric = series.get('metric', {})
+        try:
+            value = float(series['value'][1])
+        except (KeyError, IndexError, TypeError, ValueError):
+            continue
+        values[(metric.get('job', ''), metric.get('instance', ''))] = value
+    return values
+
+
+def analyze(snapshot, near_timeout_ratio=DEFAULT_NEAR_TIMEOUT_RATIO, top=DEFAULT_TOP):
+    """
+    Build the report from an API snapshot.
+
+    Scrape duration and sample counts come from the scrape_* series when present,
+    falling back to the targets API (lastScrapeDuration) for duration.
+    """
+    durations = _vector_by_target(snapshot.get('scrape_duration', {}))
+    samples = _vector_by_target(snapshot.get('scrape_samples', {}))
+
+    targets = []
+    for target in snapshot['targets'].get('activeTargets', []):
+        labels = target.get('labels', {})
+        job = labels.get('job', target.get('scrapePool', ''))
+        instance = labels.get('instance', '')
+        key = (job, instance)
+
+        interval = parse_duration(target.get('scrapeInterval'))
+        timeout = parse_duration(target.get('scrapeTimeout'))
+        duration = durations.get(key, target.get('lastScrapeDuration'))
+        sample_count = samples.get(key)
+
+        timeout_ratio = duration / timeout if duration is not None and timeout else None
+        targets.append({
+            'job': job,
+            'instance': instance,
+            'health': target.get('health', 'unknown'),
+            'last_error': target.get('lastError', ''),
+            'scrape_interval_seconds': interval,
+            'scrape_timeout_seconds': timeout,
+            'scrape_duration_seconds': duration,
+            'samples_scraped': sample_count,
+            'samples_per_second': sample_count / interval if sample_count is not None and interval else None,
+            'timeout_ratio': timeout_ratio,
+            'near_timeout': timeout_ratio is not None and timeout_ratio >= near_timeout_ratio,
+        })
+
+    jobs = {}
+    for t in targets:
+        job = jobs.setdefault(t['job'], {
+            'job': t['job'],
+            'targets': 0,
+            'unhealthy_targets': 0,
+            'near_timeout_targets': 0,
+            'samples_scraped': 0,
+            'samples_per_second': 0.0,
+            'total_scrape_duration_seconds': 0.0,
+            'max_scrape_duration_seconds': 0.0,
+        })
+        job['targets'] += 1
+        job['unhealthy_targets'] += t['health'] != 'up'
+        job['near_timeout_targets'] += t['near_timeout']
+        job['samples_scraped'] += t['samples_scraped'] or 0
+        job['samples_per_second'] += t['samples_per_second'] or 0.0
+        if t['scrape_duration_seconds'] is not None:
+            job['total_scrape_duration_seconds'] += t['scrape_duration_seconds']
+            job['max_scrape_duration_seconds'] = max(job['max_scrape_duration_seconds'], t['scrape_duration_seconds'])
+
+    total_rate = sum(j['samples_per_second'] for j in jobs.values())
+    for job in jobs.values():
+        job['ingestion_share'] = job['samples_per_second'] / total_rate if total_rate else 0.0
+
+    tsdb = snapshot.get('tsdb', {})
+    head_series = tsdb.get('headStats', {}).get('numSeries', 0)
+    heavy_metrics = [
+        {
+            'metric': entry['name'],
+            'series': entry['value'],
+            'share': entry['value'] / head_series if head_series else 0.0,
+        }
+        for entry in sorted(tsdb.get('seriesCountByMetricName', []), key=lambda e: e['value'], reverse=True)[:top]
+    ]
+
+    targets.sort(key=lambda t: (t['samples_per_second'] or 0.0, t['scrape_duration_seconds'] or 0.0), reverse=True)
+    return {
+        'summary': {
+            'targets': len(targets),
+            'unhealthy_targets': sum(t['health'] != 'up' for t in targets),
+            'near_timeout_targets': sum(t['near_timeout'] for t in targets),
+            'head_series': head_series,
+            'samples_per_second': total_rate,
+            'near_timeout_ratio': near_timeout_ratio,
+        },
+        'jobs': sorted(jobs.values(), key=lambda j: j['samples_per_second'], reverse=True),
+        'targets': targets,
+        'near_timeout': [t for t in targets if t['near_timeout']],
+        'heavy_metrics': heavy_metrics,
+    }
+
+
+def _fmt(value, spec='.3f'):
+    return '-' if value is None else format(value, spec)
+
+
+def format_text(report):
+    """Render the report as human-readable tables."""
+    summary = report['summary']
+    lines = [
+        "===== Scrape Report =====",
+        f"Targets: {summary['targets']} ({summary['unhealthy_targets']} unhealthy, "
+        f"{summary['near_timeout_targets']} near timeout)",
+        f"Head series: {summary['head_series']}",
+        f"Ingestion: {summary['samples_per_second']:.1f} samples/s",
+        "",
+        f"{'JOB':<40} {'TARGETS':>7} {'SAMPLES':>9} {'SAMPLES/S':>10} {'SHARE':>6} {'MAX DUR(s)':>10}",
+    ]
+    for job in report['jobs']:
+        lines.append(
+            f"{job['job']:<40} {job['targets']:>7} {job['samples_scraped']:>9.0f} "
+            f"{job['samples_per_second']:>10.1f} {job['ingestion_share']:>6.1%} {job['max_scrape_duration_seconds']:>10.3f}"
+        )
+
+    lines += ["", f"{'TARGET':<40} {'JOB':<30} {'HEALTH':<7} {'DUR(s)':>8} {'TIMEOUT%':>8} {'SAMPLES':>9}"]
+    for t in report['targets']:
+        ratio = '-' if t['timeout_ratio'] is None else f"{t['timeout_ratio']:.0%}"
+        flag = ' !' if t['near_timeout'] else ''
+        lines.append(
+            f"{t['instance']:<40} {t['job']:<30} {t['health']:<7} {_fmt(t['scrape_duration_seconds']):>8} "
+            f"{ratio:>8} {_fmt(t['samples_scraped'], '.0f'):>9}{flag}"
+        )
+
+    if report['heavy_metrics']:
+        lines += ["", f"{'METRIC':<60} {'SERIES':>8} {'SHARE':>6}"]
+        for m in report['heavy_metrics']:
+            lines.append(f"{m['metric']:<60} {m['series']:>8} {m['share']:>6.1%}")
+    return '\n'.join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Report Prometheus scrape target health and cost.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--prometheus-url', help="Base URL of the Prometheus server, e.g. http://localhost:9090")
+    source.add_argument('--fixtures', help="Directory with recorded API responses instead of a live server")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help="Number of series-heavy metrics to list")
+    parser.add_argument('--near-timeout-ratio', type=float, default=DEFAULT_NEAR_TIMEOUT_RATIO,
+                        help="Flag targets whose scrape duration is at least this fraction of the scrape timeout")
+    parser.add_argument('--timeout', type=float, default=10, help="HTTP timeout in seconds")
+    parser.add_argument('--fail-on-near-timeout', action='store_true',
+                        help="Exit 1 if any target is near its scrape timeout")
+    parser.add_argument('--fail-on-unhealthy', action='store_true', help="Exit 1 if any target is not up")
+    parser.add_argument('--max-samples-per-second', type=float,
+                        help="Exit 1 if total ingestion exceeds this many samples per second")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        if args.fixtures:
+            snapshot = load_snapshot_from_fixtures(args.fixtures)
+        else:
+            snapshot = load_snapshot_from_api(args.prometheus_url, timeout=args.timeout)
+    except (PrometheusAPIError, OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    report = analyze(snapshot, near_timeout_ratio=args.near_timeout_ratio, top=args.top)
+
+    failures = []
+    summary = report['summary']
+    if args.fail_on_near_timeout and summary['near_timeout_targets']:
+        failures.append(f"{summary['near_timeout_targets']} target(s) near scrape timeout")
+    if args.fail_on_unhealthy and summary['unhealthy_targets']:
+        failures.append(f"{summary['unhealthy_targets']} target(s) unhealthy")
+    if args.max_samples_per_second is not None and summary['samples_per_second'] > args.max_samples_per_second:
+        failures.append(
+            f"ingestion {summary['samples_per_second']:.1f} samples/s exceeds {args.max_samples_per_second:.1f}"
+        )
+    report['failures'] = failures
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_text(report))
+        for failure in failures:
+            print(f"FAILED: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
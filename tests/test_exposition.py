@@ -0,0 +1,168 @@
+"""
+Tests for the streaming exposition validator (scripts/exposition.py).
+"""
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import exposition  # noqa: E402
+
+pytestmark = pytest.mark.unit
+
+# Wall-clock throughput floor for test_large_payload_throughput, in MB/s; only enforced when set,
+# since timings depend on the host (about 15 MB/s on a current x86 core)
+MIN_THROUGHPUT_MB_S = os.environ.get('EXPOSITION_MIN_THROUGHPUT_MB_S')
+
+VALID_PAYLOAD = """# HELP node_cpu_seconds_total Seconds the CPUs spent in each mode.
+# TYPE node_cpu_seconds_total counter
+node_cpu_seconds_total{cpu="0",mode="idle"} 2.3e+06
+node_cpu_seconds_total{cpu="0",mode="user"} 1234.5
+node_cpu_seconds_total{cpu="1",mode="idle"} 2.2e+06
+# HELP http_request_duration_seconds Request latency.
+# TYPE http_request_duration_seconds histogram
+http_request_duration_seconds_bucket{handler="/",le="0.1"} 3
+http_request_duration_seconds_bucket{handler="/",le="1"} 7
+http_request_duration_seconds_bucket{handler="/",le="+Inf"} 8
+http_request_duration_seconds_sum{handler="/"} 4.2
+http_request_duration_seconds_count{handler="/"} 8
+# HELP go_gc_duration_seconds GC pause duration.
+# TYPE go_gc_duration_seconds summary
+go_gc_duration_seconds{quantile="0.5"} 1.2e-05
+go_gc_duration_seconds{quantile="1"} 0.0003
+go_gc_duration_seconds_sum 0.01
+go_gc_duration_seconds_count 120
+# HELP mock_service_info Service information
+# TYPE mock_service_info gauge
+mock_service_info{version="1.0.0",service="mock-service"} 1
+untyped_metric NaN 1715679072000
+"""
+
+
+def errors_for(payload):
+    return exposition.validate_text(payload)['errors']
+
+
+def test_valid_payload():
+    """Test that well-formed exposition validates and family series are counted."""
+    report = exposition.validate_text(VALID_PAYLOAD)
+    assert report['errors'] == []
+    assert report['families']['node_cpu_seconds_total']['series'] == 3
+    assert report['families']['http_request_duration_seconds']['series'] == 5
+    assert report['families']['go_gc_duration_seconds']['series'] == 4
+    assert report['families']['untyped_metric']['type'] == 'untyped'
+    assert report['series'] == 14
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 4096])
+def test_streaming_chunk_boundaries(chunk_size):
+    """Test that results do not depend on where chunks split lines or UTF-8 sequences."""
+    payload = (VALID_PAYLOAD + '# HELP label_utf8 Label with non-ASCII text.\n'
+               '# TYPE label_utf8 gauge\nlabel_utf8{city="Zürich"} 1\n').encode()
+    chunks = (payload[i:i + chunk_size] for i in range(0, len(payload), chunk_size))
+    streamed = exposition.validate_chunks(chunks)
+    assert streamed == exposition.validate_text(payload)
+    assert streamed['errors'] == []
+
+
+def test_duplicate_series_detected_regardless_of_label_order():
+    """Test that the same series with labels in a different order is a duplicate."""
+    errors = errors_for('# TYPE a gauge\na{x="1",y="2"} 1\na{y="2",x="1"} 2\n')
+    assert len(errors) == 1
+    assert "duplicate series" in errors[0]
+
+
+def test_duplicate_help_and_type():
+    """Test that a family may only have one HELP and one TYPE line."""
+    errors = errors_for('# HELP a x\n# HELP a y\n# TYPE a gauge\n# TYPE a counter\na 1\n')
+    assert any("duplicate HELP" in e for e in errors)
+    assert any("duplicate TYPE" in e for e in errors)
+
+
+def test_type_after_samples():
+    """Test that TYPE must precede the samples of its family."""
+    errors = errors_for('a 1\n# TYPE a gauge\n')
+    assert errors == ["line 2: TYPE for a after its samples"]
+
+
+def test_invalid_type():
+    """Test that unknown metric types are rejected."""
+    assert "invalid TYPE" in errors_for('# TYPE a speedometer\na 1\n')[0]
+
+
+def test_non_contiguous_family():
+    """Test that a family's samples must be grouped together."""
+    errors = errors_for('# TYPE a gauge\na{x="1"} 1\n# TYPE b gauge\nb 1\na{x="2"} 1\n')
+    assert errors == ["line 5: samples for a are not contiguous"]
+
+
+def test_histogram_counts_must_not_decrease():
+    """Test that cumulative bucket counts must be non-decreasing."""
+    errors = errors_for('# TYPE h histogram\nh_bucket{le="1"} 5\nh_bucket{le="2"} 3\nh_bucket{le="+Inf"} 5\n')
+    assert errors == ["line 3: h_bucket bucket counts decrease at le=2"]
+
+
+def test_histogram_le_must_increase():
+    """Test that bucket upper bounds must be in increasing order."""
+    errors = errors_for('# TYPE h histogram\nh_bucket{le="2"} 1\nh_bucket{le="1"} 1\nh_bucket{le="+Inf"} 1\n')
+    assert "not in increasing 'le' order" in errors[0]
+
+
+def test_histogram_requires_inf_bucket_matching_count():
+    """Test that histograms need a +Inf bucket equal to _count."""
+    assert "no '+Inf' bucket" in errors_for('# TYPE h histogram\nh_bucket{le="1"} 1\n')[0]
+    errors = errors_for('# TYPE h histogram\nh_bucket{le="+Inf"} 4\nh_count 5\n')
+    assert "does not match its '+Inf' bucket" in errors[0]
+
+
+@pytest.mark.parametrize("line,message", [
+    ('a{x="1"', "malformed sample line"),
+    ('a{x=1} 1', "malformed sample line"),
+    ('1a 1', "malformed sample line"),
+    ('a one', "invalid value"),
+    ('a 1 12.5', "invalid timestamp"),
+    ('a{x="1",x="2"} 1', "duplicate label name"),
+])
+def test_malformed_samples(line, message):
+    """Test that syntax errors in sample lines are reported."""
+    errors = errors_for(line + '\n')
+    assert len(errors) == 1
+    assert message in errors[0]
+
+
+def test_whitespace_tolerant_fallback():
+    """Test that optional whitespace in label sets is accepted."""
+    assert errors_for('a{ x = "1" , y="2" }  1  1715679072000\n') == []
+
+
+def test_max_errors_caps_report():
+    """Test that the error list is capped."""
+    report = exposition.validate_text('a 1\n' * 50, max_errors=5)
+    assert len(report['errors']) == 5
+    assert not report['valid']
+
+
+@pytest.mark.slow
+def test_large_payload_throughput():
+    """Test a megabyte-sized payload streamed in chunks, and its throughput when EXPOSITION_MIN_THROUGHPUT_MB_S is set."""
+    lines = []
+    for family in range(40):
+        lines.append(f'# HELP node_metric_{family}_total Synthetic counter.\n# TYPE node_metric_{family}_total counter\n')
+        for cpu in range(64):
+            for mode in ('idle', 'iowait', 'irq', 'nice', 'softirq', 'steal', 'system', 'user'):
+                lines.append(f'node_metric_{family}_total{{cpu="{cpu}",mode="{mode}"}} {cpu * 1000.5}\n')
+    payload = ''.join(lines).encode()
+    assert len(payload) > 1_000_000
+
+    started = time.perf_counter()
+    report = exposition.validate_chunks(payload[i:i + 65536] for i in range(0, len(payload), 65536))
+    elapsed = time.perf_counter() - started
+
+    assert report['errors'] == []
+    assert report['series'] == 40 * 64 * 8
+    if MIN_THROUGHPUT_MB_S:
+        throughput = len(payload) / 1e6 / elapsed
+        assert throughput >= float(MIN_THROUGHPUT_MB_S), f"{throughput:.1f} MB/s"
@@ -0,0 +1,94 @@
+"""
+Tests for the inventory index filters (filter_plugins/inventory_index.py) and the
+sharded scrape jobs rendered from them in prometheus.yml.j2.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'filter_plugins'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import inventory_index  # noqa: E402
+
+pytestmark = pytest.mark.unit
+
+GROUPS = {
+    'all': ['db-node', 'app-node', 'monitor-node'],
+    'app_servers': ['app-node'],
+    'database_servers': ['db-node'],
+    'monitoring_servers': ['monitor-node'],
+    'node_exporters': ['app-node', 'db-node'],
+}
+HOSTVARS = {
+    'app-node': {'ansible_host': '127.0.0.1', 'internal_ip': '192.168.56.11'},
+    'db-node': {'ansible_host': '127.0.0.1', 'internal_ip': '192.168.56.12'},
+    'monitor-node': {'ansible_host': '192.168.56.13'},
+}
+
+
+@pytest.fixture
+def index():
+    return inventory_index.inventory_index(GROUPS, HOSTVARS)
+
+
+def test_index_groups_and_members(index):
+    """Test that groups are sorted and membership maps cover every group."""
+    assert index['groups']['node_exporters'] == ['app-node', 'db-node']
+    assert 'db-node' in index['members']['node_exporters']
+    assert 'monitor-node' not in index['members']['node_exporters']
+
+
+def test_index_addresses_fall_back_in_key_order(index):
+    """Test that addresses prefer internal_ip and fall back to ansible_host, as hosts.j2 did."""
+    assert index['addresses'] == {
+        'app-node': '192.168.56.11',
+        'db-node': '192.168.56.12',
+        'monitor-node': '192.168.56.13',
+    }
+    by_ansible_host = inventory_index.inventory_index(GROUPS, HOSTVARS, 'ansible_host')
+    assert by_ansible_host['addresses']['app-node'] == '127.0.0.1'
+
+
+def test_scrape_targets(index):
+    """Test target lists for existing and missing groups."""
+    assert inventory_index.scrape_targets(index, 'node_exporters', 9100) == ['192.168.56.11:9100', '192.168.56.12:9100']
+    assert inventory_index.scrape_targets(index, 'no_such_group', 9100) == []
+
+
+@pytest.mark.parametrize("count,shard_size,expected", [
+    (0, 2, [0]),
+    (3, 0, [3]),
+    (3, 3, [3]),
+    (7, 3, [3, 3, 1]),
+])
+def test_shard_targets(count, shard_size, expected):
+    """Test that targets are split into chunks of at most shard_size, keeping order."""
+    targets = [f"10.0.0.{i}:9100" for i in range(count)]
+    shards = inventory_index.shard_targets(targets, shard_size)
+    assert [len(shard) for shard in shards] == expected
+    assert [t for shard in shards for t in shard] == targets
+
+
+def test_prometheus_config_shards_large_jobs():
+    """Test that oversized scrape jobs are split and relabelled back to one job name."""
+    pytest.importorskip('jinja2')
+    yaml = pytest.importorskip('yaml')
+    import bench_inventory_render
+
+    groups, hostvars, _ = bench_inventory_render.synthetic_inventory(100)
+    index = inventory_index.inventory_index(groups, hostvars, ['ansible_host'])
+    template = bench_inventory_render.make_environment().get_template('prometheus.yml.j2')
+    config = yaml.safe_load(template.render(
+        groups=groups, prometheus_remote_write=[],
+        prometheus_inventory_index=index, prometheus_scrape_shard_size=25))
+
+    jobs = {job['job_name']: job for job in config['scrape_configs']}
+    app_shards = [name for name in jobs if name.startswith('node-exporter-app-servers-shard-')]
+    assert len(app_shards) == 3  # 60 app servers in shards of 25
+    assert all(jobs[name]['relabel_configs'] == [{'target_label': 'job', 'replacement': 'node-exporter-app-servers'}]
+               for name in app_shards)
+    assert sum(len(jobs[name]['static_configs'][0]['targets']) for name in app_shards) == 60
+    assert len([name for name in jobs if name.startswith('node-exporter-database-servers-shard-')]) == 2
+    assert 'relabel_configs' not in jobs['prometheus']
@@ -0,0 +1,119 @@
+"""
+Tests for the mock service debug endpoints (roles/mock_service/files/mock_service_debug.py).
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'roles', 'mock_service', 'files'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import mock_service_debug  # noqa: E402
+from exposition import validate_text  # noqa: E402
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.fixture(scope='module')
+def debug_url():
+    server = mock_service_debug.start('127.0.0.1', 0)
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def get(url):
+    with urllib.request.urlopen(url, timeout=30) as response:
+        return response.read().decode()
+
+
+def busy_loop_for_profile(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+def test_debug_listener_binds_requested_address(debug_url):
+    """Test that the listener is on loopback and lists its endpoints."""
+    assert debug_url.startswith('http://127.0.0.1:')
+    assert '/debug/profile' in get(f"{debug_url}/debug")
+
+
+def test_cpu_profile_collapsed_stacks(debug_url):
+    """Test that a sampling profile returns flamegraph-ready collapsed stacks including a busy thread."""
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop_for_profile, args=(stop,), name='busy-worker', daemon=True)
+    worker.start()
+    try:
+        with urllib.request.urlopen(f"{debug_url}/debug/profile?seconds=0.5&hz=200", timeout=30) as response:
+            headers, profile = response.headers, response.read().decode()
+    finally:
+        stop.set()
+        worker.join()
+
+    assert int(headers['X-Profile-Rounds']) > 0
+    assert (headers['X-Profile-Hz'], headers['X-Profile-Seconds']) == ('200', '0.5')
+    stacks = {}
+    for line in profile.splitlines():
+        assert re.fullmatch(r'[^ ].* \d+', line)  # Every line is `frame;frame;... count`, nothing else
+        stack, count = line.rsplit(' ', 1)
+        stacks[stack] = int(count)
+    busy = [stack for stack in stacks if stack.startswith('busy-worker;')]
+    assert busy
+    assert any('busy_loop_for_profile (test_mock_service_debug.py:' in stack for stack in busy)
+    assert not any('sample_profile' in stack for stack in stacks)  # The profiler does not profile itself
+
+
+@pytest.mark.parametrize("query", ["seconds=0", "seconds=61", "hz=5000", "seconds=abc"])
+def test_cpu_profile_rejects_bad_parameters(debug_url, query):
+    """Test that out-of-range profile parameters return 400."""
+    with pytest.raises(urllib.error.HTTPError) as excinfo:
+        get(f"{debug_url}/debug/profile?{query}")
+    assert excinfo.value.code == 400
+
+
+def test_tracemalloc_snapshot_and_diff(debug_url):
+    """Test that snapshots list top allocators and diffs show growth between snapshots."""
+    with pytest.raises(urllib.error.HTTPError) as excinfo:
+        get(f"{debug_url}/debug/tracemalloc/snapshot")
+    assert excinfo.value.code == 409
+
+    assert 'tracing' in get(f"{debug_url}/debug/tracemalloc/start?frames=5")
+    try:
+        snapshot = get(f"{debug_url}/debug/tracemalloc/snapshot?top=5")
+        assert snapshot.startswith('traced: ')
+        retained = [bytearray(4096) for _ in range(256)]  # noqa: F841 - kept alive for the diff
+        diff = get(f"{debug_url}/debug/tracemalloc/diff?top=5")
+        assert 'test_mock_service_debug.py' in diff.splitlines()[1]
+    finally:
+        get(f"{debug_url}/debug/tracemalloc/stop")
+
+
+def test_thread_dump(debug_url):
+    """Test that the thread dump includes the main thread and the debug server thread."""
+    dump = get(f"{debug_url}/debug/threads")
+    assert 'Thread "MainThread"' in dump
+    assert 'Thread "debug-server"' in dump and 'serve_forever' in dump
+
+
+def test_gc_stats_and_metrics(debug_url):
+    """Test GC statistics as JSON and as valid Prometheus exposition."""
+    stats = json.loads(get(f"{debug_url}/debug/gc"))
+    assert len(stats['generations']) == 3
+    report = validate_text(mock_service_debug.gc_metrics())
+    assert report['errors'] == []
+    assert report['families']['python_gc_collections_total']['series'] == 3
+
+
+def test_sample_profile_runs_for_requested_duration():
+    """Test that sample_profile honours its duration and sampling rate."""
+    started = time.monotonic()
+    _, rounds = mock_service_debug.sample_profile(0.3, hz=50)
+    assert 0.3 <= time.monotonic() - started < 1.0
+    assert 5 <= rounds <= 16
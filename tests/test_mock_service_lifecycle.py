@@ -0,0 +1,251 @@
+"""
+Tests for mock service graceful shutdown, re-exec and socket activation
+(roles/mock_service/files/mock_service.py and its systemd units).
+
+The service runs as a real subprocess under a small HTTP load; the tests hold the
+listening socket themselves where systemd would in production.
+"""
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import pytest
+
+pytestmark = pytest.mark.unit
+
+ROLE_DIR = os.path.join(os.path.dirname(__file__), '..', 'roles', 'mock_service')
+SCRIPT = os.path.join(ROLE_DIR, 'files', 'mock_service.py')
+
+
+def service_env(tmp_path, **extra):
+    workload = tmp_path / 'workload.json'
+    workload.write_text(json.dumps({'routes': [
+        {'path': '/slow', 'latency': 150},
+        {'path': '/stuck', 'latency': 5000},
+    ]}))
+    env = dict(os.environ, MOCK_SERVICE_LOG_FILE=str(tmp_path / 'mock-service.log'),
+               MOCK_SERVICE_WORKLOAD_FILE=str(workload))
+    env.update(extra)
+    for name in ('LISTEN_PID', 'LISTEN_FDS', 'LISTEN_FDNAMES'):
+        env.pop(name, None)
+    return env
+
+
+def listening_socket():
+    """A listening socket, like the one systemd creates from mock-service.socket."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(128)
+    return sock
+
+
+def start_activated(sock, env):
+    """Start the service with `sock` on fd 3 and LISTEN_PID/LISTEN_FDS set, as systemd does."""
+    launcher = (f"import os, sys; os.dup2({sock.fileno()}, 3); "
+                "os.environ.update(LISTEN_PID=str(os.getpid()), LISTEN_FDS='1'); "
+                "os.execv(sys.executable, [sys.executable, sys.argv[1]])")
+    return subprocess.Popen([sys.executable, '-c', launcher, SCRIPT], env=env, pass_fds=(sock.fileno(),),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def get(url, timeout=15):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.status, response.read()
+
+
+def get_ignoring_errors(url):
+    try:
+        get(url)
+    except OSError:
+        pass
+
+
+def wait_until_serving(url, process, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        assert process.poll() is None, "mock service exited during startup"
+        try:
+            return get(f"{url}/health", timeout=1)
+        except OSError:
+            time.sleep(0.05)
+    raise AssertionError("mock service did not start serving")
+
+
+class Load:
+    """Background clients hitting fast and slow routes; records every failure."""
+
+    def __init__(self, url, clients=8):
+        self.url = url
+        self.stop = threading.Event()
+        self.completed = 0
+        self.failures = []
+        self._lock = threading.Lock()
+        self.threads = [threading.Thread(target=self._run, args=(i,), daemon=True) for i in range(clients)]
+
+    def _run(self, index):
+        path = '/slow' if index % 2 else '/health'
+        while not self.stop.is_set():
+            try:
+                status, _ = get(f"{self.url}{path}")
+                outcome = None if status == 200 else f"{path}: HTTP {status}"
+            except OSError as e:
+                outcome = f"{path}: {e}"
+            with self._lock:
+                if outcome is None:
+                    self.completed += 1
+                else:
+                    self.failures.append(outcome)
+
+    def __enter__(self):
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop.set()
+        for thread in self.threads:
+            thread.join()
+
+    def wait_for_requests(self, count, timeout=10):
+        deadline = time.monotonic() + timeout
+        target = self.completed + count
+        while self.completed < target and time.monotonic() < deadline:
+            time.sleep(0.02)
+
+
+@pytest.mark.slow
+def test_no_failed_requests_across_socket_activated_restart(tmp_path):
+    """Test that a SIGTERM drain plus a new instance on the same socket fails no requests."""
+    sock = listening_socket()
+    url = f"http://127.0.0.1:{sock.getsockname()[1]}"
+    env = service_env(tmp_path, MOCK_SERVICE_DRAIN_SECONDS='5')
+    first = start_activated(sock, env)
+    second = None
+    try:
+        wait_until_serving(url, first)
+        with Load(url) as load:
+            load.wait_for_requests(20)
+            first.send_signal(signal.SIGTERM)
+            assert first.wait(timeout=10) == 0
+            time.sleep(0.3)  # Connections queue in the kernel while no process is accepting
+            second = start_activated(sock, env)
+            load.wait_for_requests(40)
+        assert load.failures == []
+        assert load.completed >= 60
+    finally:
+        for process in (first, second):
+            if process is not None and process.poll() is None:
+                process.kill()
+                process.wait()
+        sock.close()
+
+
+@pytest.mark.slow
+def test_sighup_reexecs_without_failed_requests(tmp_path):
+    """Test that SIGHUP re-executes in place (same PID, same socket) without failing requests."""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    env = service_env(tmp_path, MOCK_SERVICE_PORT=str(port))
+    process = subprocess.Popen([sys.executable, SCRIPT], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_serving(url, process)
+        with Load(url) as load:
+            load.wait_for_requests(20)
+            process.send_signal(signal.SIGHUP)
+            load.wait_for_requests(20)
+            process.send_signal(signal.SIGHUP)
+            load.wait_for_requests(40)
+        assert load.failures == []
+        assert process.poll() is None
+        log = (tmp_path / 'mock-service.log').read_text()
+        assert log.count("Re-executing mock service") == 2
+        assert log.count("(inherited socket)") == 2
+    finally:
+        process.kill()
+        process.wait()
+
+
+def test_signals_during_startup_are_not_fatal(tmp_path):
+    """Test that a SIGHUP sent while the service is still starting re-executes it instead of killing it."""
+    log = tmp_path / 'mock-service.log'
+    sock = listening_socket()
+    url = f"http://127.0.0.1:{sock.getsockname()[1]}"
+    process = start_activated(sock, service_env(tmp_path))
+    try:
+        deadline = time.monotonic() + 10
+        while not log.exists() and time.monotonic() < deadline:  # Opened once the handlers are installed
+            time.sleep(0.005)
+        process.send_signal(signal.SIGHUP)
+        assert wait_until_serving(url, process)[0] == 200
+        assert "Re-executing mock service" in log.read_text()
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=10) == 0
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        sock.close()
+
+
+@pytest.mark.slow
+def test_drain_deadline_bounds_shutdown(tmp_path):
+    """Test that SIGTERM waits for in-flight requests only up to the drain deadline."""
+    sock = listening_socket()
+    url = f"http://127.0.0.1:{sock.getsockname()[1]}"
+    process = start_activated(sock, service_env(tmp_path, MOCK_SERVICE_DRAIN_SECONDS='0.5'))
+    try:
+        wait_until_serving(url, process)
+        threading.Thread(target=get_ignoring_errors, args=(f"{url}/stuck",), daemon=True).start()
+        time.sleep(0.3)
+        started = time.monotonic()
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=5) == 0
+        assert time.monotonic() - started < 2.5
+        assert "Drain deadline of 0.5s passed with 1 request(s) in flight" in (tmp_path / 'mock-service.log').read_text()
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        sock.close()
+
+
+@pytest.mark.parametrize("activation", [True, False])
+def test_units_render_socket_activation(activation):
+    """Test the socket unit and the service unit's socket, reload and stop settings."""
+    jinja2 = pytest.importorskip('jinja2')
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader(os.path.join(ROLE_DIR, 'templates')), trim_blocks=True)
+    env.filters['bool'] = lambda value: str(value).lower() in ('1', 'true', 'yes', 'on')
+    env.filters['systemd_resource_directives'] = lambda profile: []
+    variables = {
+        'mock_service_name': 'mock-service', 'mock_service_description': 'Mock HTTP Service',
+        'mock_service_user': 'mock-service', 'mock_service_group': 'mock-service',
+        'mock_service_working_dir': '/opt/mock-service', 'mock_service_port': 8080,
+        'mock_service_bind_address': '0.0.0.0', 'mock_service_socket_backlog': 1024,
+        'mock_service_log_file': '/var/log/mock-service.log', 'mock_service_debug_enabled': False,
+        'mock_service_debug_bind_address': '127.0.0.1', 'mock_service_debug_port': 6060,
+        'mock_service_workload_routes': [], 'mock_service_environment_file': '/etc/default/mock-service',
+        'mock_service_resource_profile': {}, 'mock_service_python_path': '/usr/bin/python3',
+        'mock_service_script_path': '/opt/mock-service/mock_service.py', 'mock_service_restart_policy': 'always',
+        'mock_service_restart_sec': 10, 'mock_service_drain_seconds': 10,
+        'mock_service_socket_activation': activation,
+    }
+    service = env.get_template('mock-service.service.j2').render(variables).splitlines()
+    assert 'ExecReload=/bin/kill -HUP $MAINPID' in service
+    assert 'Environment=MOCK_SERVICE_DRAIN_SECONDS=10' in service
+    assert 'TimeoutStopSec=15' in service
+    assert 'Environment=MOCK_SERVICE_BIND_ADDRESS=0.0.0.0' in service
+    assert ('Requires=mock-service.socket' in service) is activation
+
+    socket_unit = env.get_template('mock-service.socket.j2').render(variables).splitlines()
+    assert 'ListenStream=0.0.0.0:8080' in socket_unit
+    assert 'Backlog=1024' in socket_unit
+    assert 'WantedBy=sockets.target' in socket_unit
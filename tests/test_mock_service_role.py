@@ -3,8 +3,13 @@ Tests for the Mock Service role.
 """
 import pytest
 import os
+import sys
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from exposition import validate_text  # noqa: E402
+
 load_dotenv()
 
 # Load configuration from environment variables - will raise KeyError if missing
@@ -73,6 +78,32 @@ def test_mock_service_systemd_configuration(host, is_mock_service_server):
         assert service_file.contains(f"User={MOCK_SERVICE_USER}")
         assert service_file.contains(f"Group={MOCK_SERVICE_GROUP}")
 
+def test_mock_service_bytecode_precompiled(host, is_mock_service_server):
+    """Test that the deploy precompiled the service modules, so starts do not compile them."""
+    if is_mock_service_server:
+        pycache = os.path.join(os.path.dirname(MOCK_SERVICE_SCRIPT_PATH), "__pycache__")
+        for module in ("mock_service", "mock_service_debug", "mock_service_workload"):
+            assert host.run(f"ls {pycache}/{module}.*.pyc").rc == 0
+
+def test_mock_service_socket_activation(host, is_mock_service_server):
+    """Test that systemd owns the listening socket and the service supports reload."""
+    if is_mock_service_server:
+        socket_unit = host.service(f"{MOCK_SERVICE_NAME}.socket")
+        assert socket_unit.is_enabled
+        assert socket_unit.is_running
+        service_file = host.file(MOCK_SERVICE_SYSTEMD_SERVICE)
+        assert service_file.contains(f"Requires={MOCK_SERVICE_NAME}.socket")
+        assert service_file.contains("ExecReload=/bin/kill -HUP $MAINPID")
+
+def test_mock_service_environment_file_is_private(host, is_mock_service_server):
+    """Test that the EnvironmentFile holding the MariaDB password, written only for MariaDB routes, is readable by root only."""
+    if is_mock_service_server:
+        env_file = host.file(f"/etc/default/{MOCK_SERVICE_NAME}")
+        if env_file.exists:
+            assert env_file.user == "root"
+            assert env_file.mode == 0o600
+        assert host.file(MOCK_SERVICE_SYSTEMD_SERVICE).contains(f"EnvironmentFile=-/etc/default/{MOCK_SERVICE_NAME}")
+
 def test_mock_service_endpoints(host, is_mock_service_server):
     """Test that Mock Service HTTP endpoints are accessible."""
     if is_mock_service_server:
@@ -99,4 +130,13 @@ def test_mock_service_metrics_format(host, is_mock_service_server):
         # Check for Prometheus metrics format
         assert "# HELP" in result.stdout
         assert "# TYPE" in result.stdout
-        assert "mock_service_" in result.stdout 
+        assert "mock_service_" in result.stdout
+
+def test_mock_service_metrics_exposition_valid(host, is_mock_service_server):
+    """Test that Mock Service metrics are valid Prometheus text exposition."""
+    if is_mock_service_server:
+        result = host.run(f"curl -s http://localhost:{MOCK_SERVICE_PORT}/metrics")
+        assert result.rc == 0
+        report = validate_text(result.stdout)
+        assert report['errors'] == []
+        assert 'mock_service_info' in report['families']
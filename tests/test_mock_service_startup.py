@@ -0,0 +1,208 @@
+"""
+Startup time and memory of the mock service (roles/mock_service/files/mock_service.py).
+
+The import is measured with `python -X importtime` on a precompiled copy, the way
+the role deploys it, and compared with the stdlib http.server baseline measured in
+the same run. Absolute budgets are opt-in (MOCK_SERVICE_IMPORT_BUDGET_MS and
+MOCK_SERVICE_RSS_BUDGET_MB), since wall-clock and RSS numbers depend on the host.
+"""
+import json
+import os
+import shutil
+import socket
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+FILES_DIR = os.path.join(os.path.dirname(__file__), '..', 'roles', 'mock_service', 'files')
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), '..', 'roles', 'mock_service', 'templates')
+sys.path.insert(0, FILES_DIR)
+
+import mock_service  # noqa: E402
+
+pytestmark = pytest.mark.unit
+
+# Optional absolute budgets: cumulative import time of mock_service, and peak RSS of an interpreter
+# that has imported it and bound its server over a bare interpreter
+IMPORT_BUDGET_MS = os.environ.get('MOCK_SERVICE_IMPORT_BUDGET_MS')
+RSS_BUDGET_MB = os.environ.get('MOCK_SERVICE_RSS_BUDGET_MB')
+# Only imported on first use (or never on the default path)
+DEFERRED_MODULES = ('http.server', 'http.client', 'email', 'ssl', 'json', 'datetime',
+                    'mock_service_debug', 'mock_service_workload')
+
+
+@pytest.fixture(scope='module')
+def deployed(tmp_path_factory):
+    """A copy of the role's files precompiled like the deploy does, and an env that logs into it."""
+    target = tmp_path_factory.mktemp('mock-service')
+    for name in os.listdir(FILES_DIR):
+        if name.endswith('.py'):
+            shutil.copy(os.path.join(FILES_DIR, name), target / name)
+    subprocess.run([sys.executable, '-m', 'compileall', '-q', str(target)], check=True)
+    env = dict(os.environ, MOCK_SERVICE_LOG_FILE=str(target / 'mock-service.log'))
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    return target, env
+
+
+def import_times(target, env, module='mock_service'):
+    """Return {module: cumulative microseconds} from `python -X importtime -c 'import <module>'`."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=target, env=env, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:'):
+            _, cumulative, name = line[len('import time:'):].split('|')
+            if cumulative.strip().isdigit():  # Skips the header line
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+def peak_rss_kb(code, cwd, env):
+    """Peak RSS of a fresh interpreter running `code`. VmHWM belongs to the exec'd image,
+    unlike ru_maxrss, which keeps the forking pytest process's high-water mark."""
+    script = code + ("\nprint([line.split()[1] for line in open('/proc/self/status')"
+                     " if line.startswith('VmHWM:')][0])")
+    result = subprocess.run([sys.executable, '-c', script], cwd=cwd, env=env,
+                            capture_output=True, text=True, check=True)
+    return int(result.stdout.split()[-1])
+
+
+def exchange(raw_request):
+    """Run one request through MockHTTPRequestHandler over a socket pair; return (handler, raw response)."""
+    server_end, client_end = socket.socketpair()
+    with server_end, client_end:
+        client_end.sendall(raw_request)
+        client_end.shutdown(socket.SHUT_WR)
+        handler = mock_service.MockHTTPRequestHandler(server_end, ('127.0.0.1', 40000), None)
+        server_end.shutdown(socket.SHUT_WR)
+        response = b''
+        while chunk := client_end.recv(65536):
+            response += chunk
+    return handler, response
+
+
+def test_import_defers_rarely_used_modules(deployed):
+    """Test that importing the service loads neither http.server's dependency tree nor first-use modules."""
+    target, env = deployed
+    loaded = import_times(target, env)
+    assert 'mock_service' in loaded
+    assert [name for name in loaded if name.split('.')[0] in DEFERRED_MODULES or name in DEFERRED_MODULES] == []
+
+
+def test_import_opens_no_log_file(deployed):
+    """Test that the log file is only opened by main(), not at import time."""
+    target, env = deployed
+    import_times(target, env)
+    assert not (target / 'mock-service.log').exists()
+
+
+def test_import_time_below_stdlib_handler(deployed):
+    """Test that importing the precompiled service costs less than importing the http.server it defers."""
+    target, env = deployed
+    best_ms = min(import_times(target, env)['mock_service'] for _ in range(5)) / 1000
+    baseline_ms = min(import_times(target, env, 'http.server')['http.server'] for _ in range(5)) / 1000
+    assert best_ms <= baseline_ms, f"import took {best_ms:.1f}ms, http.server alone {baseline_ms:.1f}ms"
+    if IMPORT_BUDGET_MS:
+        assert best_ms <= float(IMPORT_BUDGET_MS), f"import took {best_ms:.1f}ms, budget {IMPORT_BUDGET_MS}ms"
+
+
+def test_baseline_rss_below_stdlib_server(deployed):
+    """Test that importing the service and binding its server adds less RSS than a stdlib ThreadingHTTPServer."""
+    if not os.path.exists('/proc/self/status'):
+        pytest.skip("needs /proc/self/status (Linux)")
+    target, env = deployed
+    bare = peak_rss_kb('pass', target, env)
+    service = peak_rss_kb("import mock_service\nserver = mock_service.MockHTTPServer(('127.0.0.1', 0))", target, env)
+    stdlib = peak_rss_kb("import http.server\n"
+                         "server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), http.server.BaseHTTPRequestHandler)",
+                         target, env)
+    growth_mb, baseline_mb = (service - bare) / 1024, (stdlib - bare) / 1024
+    assert growth_mb < baseline_mb, f"RSS grew by {growth_mb:.1f}MB, stdlib server {baseline_mb:.1f}MB"
+    if RSS_BUDGET_MB:
+        assert growth_mb <= float(RSS_BUDGET_MB), f"RSS grew by {growth_mb:.1f}MB, budget {RSS_BUDGET_MB}MB"
+
+
+def test_handler_is_the_stdlib_handler():
+    """Test that requests are served by http.server's handler (case-insensitive headers, stdlib parsing)."""
+    from http.server import BaseHTTPRequestHandler
+    handler, response = exchange(b"GET /health HTTP/1.1\r\nHost: localhost\r\nUser-Agent: test\r\n\r\n")
+    assert isinstance(handler, BaseHTTPRequestHandler)
+    assert handler.headers.get('user-agent') == handler.headers.get('User-Agent') == 'test'
+    assert handler.headers['User-Agent'] == 'test' and 'USER-AGENT' in handler.headers
+    status_line, _, rest = response.partition(b'\r\n')
+    assert status_line == b'HTTP/1.0 200 OK'
+    assert json.loads(rest.split(b'\r\n\r\n', 1)[1])['status'] == 'healthy'
+
+
+@pytest.mark.parametrize("raw_request,status", [
+    (b"GET /nowhere HTTP/1.1\r\n\r\n", b'404'),
+    (b"POST / HTTP/1.1\r\nContent-Length: 0\r\n\r\n", b'200'),
+    (b"GET / HTTP/1.1\r\n" + b"X-Header: value\r\n" * 101 + b"\r\n", b'431'),
+    (b"GET / HTTP/1.1\r\nX-Folded: a\r\n b\r\n\r\n", b'200'),
+    (b"PATCH / HTTP/1.1\r\n\r\n", b'501'),
+    (b"GET /" + b"a" * 70000 + b" HTTP/1.1\r\n\r\n", b'414'),
+])
+def test_handler_statuses(raw_request, status):
+    """Test the handler's responses to valid, malformed and unsupported requests."""
+    _, response = exchange(raw_request)
+    assert response.startswith(b'HTTP/1.0 ' + status + b' ')
+    assert b'\r\nDate: ' in response and b'\r\nServer: MockService/1.0 ' in response
+
+
+def test_idle_client_is_dropped(monkeypatch):
+    """Test that a client that never sends its request does not hold a handler thread."""
+    monkeypatch.setattr(mock_service.MockHTTPRequestHandler, 'timeout', 0.2)
+    server_end, client_end = socket.socketpair()
+    with server_end, client_end:
+        client_end.sendall(b"GET / HTTP/1.1\r\n")
+        started = time.monotonic()
+        mock_service.MockHTTPRequestHandler(server_end, ('127.0.0.1', 40000), None)
+        assert time.monotonic() - started < 2
+
+
+def test_startup_optimized_reexec_keeps_module_mode(deployed, tmp_path):
+    """Test that a reload of `python -s -m mock_service` re-executes with -s -m, from bytecode."""
+    target, env = deployed
+    log = tmp_path / 'mock-service.log'
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    env = dict(env, PYTHONPATH=str(target), MOCK_SERVICE_LOG_FILE=str(log), MOCK_SERVICE_PORT=str(port),
+               MOCK_SERVICE_BIND_ADDRESS='127.0.0.1')
+    process = subprocess.Popen([sys.executable, '-s', '-m', 'mock_service'], cwd='/', env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline and 'starting on' not in (log.read_text() if log.exists() else ''):
+            time.sleep(0.02)
+        process.send_signal(signal.SIGHUP)
+        while time.monotonic() < deadline and '(inherited socket)' not in log.read_text():
+            time.sleep(0.02)
+        assert process.poll() is None
+        with open(f'/proc/{process.pid}/cmdline', 'rb') as f:
+            cmdline = f.read().split(b'\0')[:-1]
+        assert cmdline == [os.fsencode(sys.executable), b'-s', b'-m', b'mock_service']
+    finally:
+        process.kill()
+        process.wait()
+
+
+def test_startup_optimized_unit_runs_module_from_bytecode():
+    """Test that the startup-optimized unit runs the module with -s -m from its directory."""
+    jinja2 = pytest.importorskip('jinja2')
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader(TEMPLATES_DIR), trim_blocks=True)
+    env.filters['bool'] = lambda value: str(value).lower() in ('1', 'true', 'yes', 'on')
+    env.filters['systemd_resource_directives'] = lambda profile: []
+    variables = {
+        'mock_service_python_path': '/usr/bin/python3', 'mock_service_script_path': '/opt/mock-service/mock_service.py',
+        'mock_service_module_dir': '/opt/mock-service', 'mock_service_module_name': 'mock_service',
+        'mock_service_workload_routes': [], 'mock_service_socket_activation': False, 'mock_service_drain_seconds': 10,
+    }
+    optimized = env.get_template('mock-service.service.j2').render(variables, mock_service_startup_optimized=True)
+    assert 'ExecStart=/usr/bin/python3 -s -m mock_service' in optimized.splitlines()
+    assert 'Environment=PYTHONPATH=/opt/mock-service' in optimized.splitlines()
+    default = env.get_template('mock-service.service.j2').render(variables, mock_service_startup_optimized=False)
+    assert 'ExecStart=/usr/bin/python3 /opt/mock-service/mock_service.py' in default.splitlines()
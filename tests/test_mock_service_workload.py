@@ -0,0 +1,278 @@
+"""
+Tests for the mock service workload engine (roles/mock_service/files/mock_service_workload.py).
+"""
+import json
+import os
+import random
+import re
+import socketserver
+import statistics
+import struct
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'roles', 'mock_service', 'files'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import mock_service_workload as workload_engine  # noqa: E402
+from exposition import validate_text  # noqa: E402
+
+pytestmark = pytest.mark.unit
+
+MARIADB_PASSWORD = 'YourSecureMonitoringPassword456!'
+MARIADB_SALT = bytes(range(1, 21))
+
+
+# =============================================================================
+# FAKE MARIADB
+# =============================================================================
+
+def _packet(seq, payload):
+    return struct.pack('<I', len(payload))[:3] + bytes([seq]) + payload
+
+
+class FakeMariaDBHandler(socketserver.BaseRequestHandler):
+    """Just enough of the server side of the protocol: handshake, native password auth, one-row queries."""
+
+    def read_packet(self):
+        header = self.request.recv(4)
+        if len(header) < 4:
+            return None, None
+        length = header[0] | header[1] << 8 | header[2] << 16
+        payload = b''
+        while len(payload) < length:
+            payload += self.request.recv(length - len(payload))
+        return header[3], payload
+
+    def handle(self):
+        server = self.server
+        capabilities = 0xF7FF | (workload_engine.CLIENT_PLUGIN_AUTH | workload_engine.CLIENT_SECURE_CONNECTION)
+        handshake = (b'\x0a' + b'10.6.0-fake\0' + struct.pack('<I', 7) + MARIADB_SALT[:8] + b'\0'
+                     + struct.pack('<HBHH', capabilities & 0xFFFF, 45, 2, capabilities >> 16)
+                     + bytes([21]) + b'\0' * 10 + MARIADB_SALT[8:] + b'\0' + b'mysql_native_password\0')
+        self.request.sendall(_packet(0, handshake))
+        seq, response = self.read_packet()
+        user, _, rest = response[32:].partition(b'\0')
+        auth = rest[1:1 + rest[0]]
+        server.logins.append(user.decode())
+        if auth != workload_engine.native_password_scramble(MARIADB_PASSWORD, MARIADB_SALT):
+            self.request.sendall(_packet(seq + 1, b'\xff\x15\x04#28000Access denied'))
+            return
+        self.request.sendall(_packet(seq + 1, b'\x00\x00\x00\x02\x00\x00\x00'))
+        while True:
+            seq, command = self.read_packet()
+            if command is None or command[0] == workload_engine.COM_QUIT:
+                return
+            server.queries.append(command[1:].decode())
+            eof = b'\xfe\x00\x00\x02\x00'
+            for offset, payload in enumerate((b'\x01', b'\x03def\x00\x00\x00\x011\x00\x0c\x3f\x00\x01\x00\x00\x00\x08\x81\x00\x00\x00\x00',
+                                              eof, b'\x011', eof), start=1):
+                self.request.sendall(_packet(seq + offset, payload))
+
+
+@pytest.fixture
+def fake_mariadb():
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), FakeMariaDBHandler)
+    server.daemon_threads = True
+    server.logins, server.queries = [], []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+# =============================================================================
+# HTTP
+# =============================================================================
+
+@pytest.fixture
+def serve_workload():
+    servers = []
+
+    def start(spec, mariadb=None):
+        engine = workload_engine.Workload(spec, mariadb)
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body = engine.metrics().encode()
+                    self.send_response(200)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                elif not engine.serve(self):
+                    self.send_error(404)
+
+            do_POST = do_GET
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}", engine
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def request(url, data=None):
+    """Return (status, body) without raising on error statuses."""
+    try:
+        with urllib.request.urlopen(url, data=data, timeout=10) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def sample_value(metrics, name, **labels):
+    wanted = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf'^{name}\{{{re.escape(wanted)}\}} (\S+)$', metrics, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+# =============================================================================
+# TESTS
+# =============================================================================
+
+@pytest.mark.parametrize("spec,message", [
+    ({}, "'routes' list"),
+    ({'routes': [{'path': 'api'}]}, "must start with '/'"),
+    ({'routes': [{'path': '/metrics'}]}, "reserved"),
+    ({'routes': [{'path': '/a', 'methods': ['DELETE']}]}, "methods must be a non-empty subset"),
+    ({'routes': [{'path': '/a'}, {'path': '/a'}]}, "duplicate route GET /a"),
+    ({'routes': [{'path': '/a', 'latency': {'distribution': 'pareto'}}]}, "unknown latency distribution"),
+    ({'routes': [{'path': '/a', 'latency': {'distribution': 'lognormal', 'median_ms': 50, 'p99_ms': 10}}]},
+     "'p99_ms'=10 is outside"),
+    ({'routes': [{'path': '/a', 'error_ratio': 1.5}]}, "'error_ratio'=1.5 is outside"),
+    ({'routes': [{'path': '/a', 'response_bytes': {'min': 10, 'max': 5}}]}, "'min' must not exceed 'max'"),
+])
+def test_invalid_specs_rejected(spec, message):
+    """Test that invalid workload specs fail at load time with the route in the message."""
+    with pytest.raises(workload_engine.SpecError, match=re.escape(message)):
+        workload_engine.Workload(spec)
+
+
+def test_lognormal_latency_matches_median_and_p99():
+    """Test that the lognormal sampler reproduces the configured median and p99."""
+    sample = workload_engine.latency_sampler(
+        {'distribution': 'lognormal', 'median_ms': 40, 'p99_ms': 400}, random.Random(1))
+    draws = sorted(sample() for _ in range(20000))
+    assert statistics.median(draws) == pytest.approx(0.040, rel=0.05)
+    assert draws[int(len(draws) * 0.99)] == pytest.approx(0.400, rel=0.15)
+
+
+def test_route_shapes_responses(serve_workload):
+    """Test response size, latency and synthetic errors per route."""
+    url, _ = serve_workload({'seed': 7, 'routes': [
+        {'path': '/fixed', 'response_bytes': 2048, 'latency': 50},
+        {'path': '/ranged', 'methods': ['GET', 'POST'], 'response_bytes': {'min': 100, 'max': 200}},
+        {'path': '/broken', 'error_ratio': 1.0, 'error_status': 503},
+    ]})
+    started = time.monotonic()
+    status, body = request(f"{url}/fixed")
+    assert time.monotonic() - started >= 0.05
+    assert (status, len(body)) == (200, 2048)
+    for _ in range(20):
+        status, body = request(f"{url}/ranged?page=2", data=b'{"order": 1}')
+        assert status == 200 and 100 <= len(body) <= 200
+    status, body = request(f"{url}/broken")
+    assert status == 503 and json.loads(body)['route'] == '/broken'
+    assert request(f"{url}/unknown")[0] == 404
+
+
+def test_cpu_work_is_burned_on_the_request_thread():
+    """Test that cpu_ms is spent as CPU time, not sleep."""
+    started = time.thread_time()
+    workload_engine.burn_cpu(0.05)
+    assert time.thread_time() - started >= 0.05
+
+
+def test_routes_are_instrumented(serve_workload):
+    """Test that every route has valid per-route metrics, including before any traffic."""
+    url, engine = serve_workload({'seed': 3, 'routes': [
+        {'path': '/a', 'response_bytes': 10},
+        {'path': '/idle'},
+        {'path': '/flaky', 'error_ratio': 0.5},
+    ]})
+    idle = request(f"{url}/metrics")[1].decode()
+    assert sample_value(idle, 'mock_service_route_requests_total', route='/idle', method='GET', code='200') == 0
+    assert sample_value(idle, 'mock_service_route_requests_total', route='/flaky', method='GET', code='500') == 0
+    assert 'route="/a",method="GET",code="500"' not in idle  # Only codes the route can answer with
+    for _ in range(3):
+        request(f"{url}/a")
+    for _ in range(40):
+        request(f"{url}/flaky")
+    metrics = request(f"{url}/metrics")[1].decode()
+    report = validate_text(metrics)
+    assert report['errors'] == []
+    assert sample_value(metrics, 'mock_service_route_requests_total', route='/a', method='GET', code='200') == 3
+    assert sample_value(metrics, 'mock_service_route_response_bytes_total', route='/a', method='GET') == 30
+    assert sample_value(metrics, 'mock_service_route_request_duration_seconds_count', route='/idle', method='GET') == 0
+    ok = sample_value(metrics, 'mock_service_route_requests_total', route='/flaky', method='GET', code='200')
+    failed = sample_value(metrics, 'mock_service_route_requests_total', route='/flaky', method='GET', code='500')
+    assert ok + failed == 40 and 8 <= failed <= 32
+    assert sample_value(metrics, 'mock_service_route_in_flight', route='/a', method='GET') == 0
+
+
+def test_mariadb_downstream_call(serve_workload, fake_mariadb):
+    """Test the downstream query as the monitoring user, connection reuse and its metrics."""
+    client = workload_engine.MariaDBClient('127.0.0.1', fake_mariadb.server_address[1],
+                                           'monitoring', MARIADB_PASSWORD, 'monitoring')
+    url, _ = serve_workload({'routes': [{'path': '/orders', 'mariadb': {'query': 'SELECT COUNT(*) FROM system_metrics'}}]},
+                            client)
+    for _ in range(3):
+        assert request(f"{url}/orders")[0] == 200
+    assert fake_mariadb.logins == ['monitoring']  # One connection, reused
+    assert fake_mariadb.queries == ['SELECT COUNT(*) FROM system_metrics'] * 3
+    metrics = request(f"{url}/metrics")[1].decode()
+    assert sample_value(metrics, 'mock_service_route_downstream_duration_seconds_count',
+                        route='/orders', downstream='mariadb') == 3
+    assert sample_value(metrics, 'mock_service_route_downstream_errors_total', route='/orders', downstream='mariadb') == 0
+    client.close()
+
+
+def test_mariadb_failure_returns_502(serve_workload, fake_mariadb):
+    """Test that a rejected login is answered with 502 and counted as a downstream error."""
+    client = workload_engine.MariaDBClient('127.0.0.1', fake_mariadb.server_address[1],
+                                           'monitoring', 'wrong', 'monitoring')
+    url, _ = serve_workload({'routes': [{'path': '/orders', 'mariadb': True}]}, client)
+    metrics = request(f"{url}/metrics")[1].decode()
+    assert sample_value(metrics, 'mock_service_route_requests_total', route='/orders', method='GET', code='502') == 0
+    status, body = request(f"{url}/orders")
+    assert status == 502 and json.loads(body)['error'] == 'downstream error'
+    metrics = request(f"{url}/metrics")[1].decode()
+    assert sample_value(metrics, 'mock_service_route_downstream_errors_total', route='/orders', downstream='mariadb') == 1
+    assert sample_value(metrics, 'mock_service_route_requests_total', route='/orders', method='GET', code='502') == 1
+
+
+def test_yaml_spec_loads(tmp_path):
+    """Test that YAML specs load when PyYAML is installed."""
+    pytest.importorskip('yaml')
+    spec = tmp_path / 'workload.yml'
+    spec.write_text("routes:\n  - path: /api\n    latency: {distribution: uniform, min_ms: 1, max_ms: 2}\n")
+    engine = workload_engine.Workload.from_file(str(spec))
+    assert list(engine.routes) == [('GET', '/api')]
+
+
+def test_environment_file_quotes_password():
+    """Test that the EnvironmentFile template quotes passwords for systemd."""
+    jinja2 = pytest.importorskip('jinja2')
+    templates = os.path.join(os.path.dirname(__file__), '..', 'roles', 'mock_service', 'templates')
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader(templates), trim_blocks=True)
+    rendered = env.get_template('mock-service.env.j2').render(
+        mock_service_mariadb_host='192.168.56.12', mock_service_mariadb_port=3306,
+        mock_service_mariadb_user='monitoring', mock_service_mariadb_database='monitoring',
+        mock_service_mariadb_password='pa"ss\\word')
+    assert 'MOCK_SERVICE_MARIADB_PASSWORD="pa\\"ss\\\\word"' in rendered.splitlines()
+    assert 'MOCK_SERVICE_MARIADB_HOST=192.168.56.12' in rendered.splitlines()
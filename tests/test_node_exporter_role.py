@@ -3,9 +3,14 @@ Tests for the Node Exporter role.
 """
 import pytest
 import os
+import sys
 import logging
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+from exposition import validate_text  # noqa: E402
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
@@ -51,6 +56,21 @@ def test_node_exporter_binary_exists(host, has_node_exporter):
         assert binary.mode == 0o755
 
 
+def test_node_exporter_binary_reports_version(host, has_node_exporter):
+    """Test that the installed Node Exporter binary reports its version (used to skip re-downloads)."""
+    if has_node_exporter:
+        result = host.run(f"{NODE_EXPORTER_INSTALL_DIR}/node_exporter --version")
+        assert result.rc == 0
+        assert "node_exporter, version " in result.stdout + result.stderr
+
+
+def test_node_exporter_no_archive_left_on_target(host, has_node_exporter):
+    """Test that no Node Exporter release archive is left in /tmp on hosts with node exporter."""
+    if has_node_exporter:
+        result = host.run("ls /tmp/node_exporter-*.tar.gz")
+        assert result.rc != 0
+
+
 def test_node_exporter_systemd_service_exists(host, has_node_exporter):
     """Test that Node Exporter systemd service file exists on hosts with node exporter."""
     if has_node_exporter:
@@ -68,6 +88,20 @@ def test_node_exporter_systemd_service_content(host, has_node_exporter):
         assert service_file.contains(f"Group={NODE_EXPORTER_GROUP}")
 
 
+def test_node_exporter_resource_limits_applied(host, has_node_exporter):
+    """Test that the resource profile is active on the running Node Exporter unit."""
+    if has_node_exporter:
+        show = host.run(f"systemctl show {NODE_EXPORTER_SERVICE_NAME} "
+                        "-p MemoryMax -p CPUQuotaPerSecUSec -p Nice -p IOWeight -p Environment")
+        assert show.rc == 0
+        properties = dict(line.split('=', 1) for line in show.stdout.splitlines() if '=' in line)
+        assert properties['MemoryMax'] != 'infinity'
+        assert properties['CPUQuotaPerSecUSec'] != 'infinity'
+        assert properties['Nice'] == '10'
+        assert 'GOMAXPROCS=1' in properties['Environment']
+        assert 'GOMEMLIMIT=' in properties['Environment']
+
+
 def test_node_exporter_process_running(host, has_node_exporter):
     """Test that Node Exporter process is running on hosts with node exporter."""
     if has_node_exporter:
@@ -135,3 +169,13 @@ def test_node_exporter_collectors_enabled(host, has_node_exporter):
         assert "node_cpu_seconds_total" in result.stdout
         assert "node_memory_MemTotal_bytes" in result.stdout
         assert "node_filesystem_size_bytes" in result.stdout
+
+
+def test_node_exporter_metrics_exposition_valid(host, has_node_exporter):
+    """Test that Node Exporter metrics are valid Prometheus text exposition on hosts with node exporter."""
+    if has_node_exporter:
+        result = host.run(f"curl -s http://localhost:{NODE_EXPORTER_PORT}/metrics")
+        assert result.rc == 0
+        report = validate_text(result.stdout)
+        assert report['errors'] == []
+        logger.info(f"Node Exporter exposes {report['series']} series in {len(report['families'])} families")
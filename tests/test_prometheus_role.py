@@ -88,6 +88,21 @@ def test_prometheus_binary_exists_and_permissions(host, is_monitoring_server):
         assert binary.group == PROMETHEUS_GROUP
 
 
+def test_prometheus_binary_reports_version(host, is_monitoring_server):
+    """Test that the installed Prometheus binary reports its version (used to skip re-downloads)."""
+    if is_monitoring_server:
+        result = host.run(f"{PROMETHEUS_INSTALL_DIR}/{PROMETHEUS_BINARY_NAME} --version")
+        assert result.rc == 0
+        assert "prometheus, version " in result.stdout + result.stderr
+
+
+def test_prometheus_no_archive_left_on_target(host, is_monitoring_server):
+    """Test that no Prometheus release archive is left in /tmp on monitoring servers."""
+    if is_monitoring_server:
+        result = host.run("ls /tmp/prometheus-*.tar.gz")
+        assert result.rc != 0
+
+
 def test_prometheus_systemd_service_exists(host, is_monitoring_server):
     """Test that Prometheus systemd service file exists on monitoring servers."""
     if is_monitoring_server:
@@ -0,0 +1,165 @@
+"""
+Tests for hashmod scrape sharding across monitoring servers
+(filter_plugins/prometheus_sharding.py and the sharded prometheus.yml.j2).
+"""
+import collections
+import json
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'filter_plugins'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import prometheus_sharding  # noqa: E402
+
+pytestmark = pytest.mark.unit
+
+SLOTS = 1024
+PROMETHEUS_DEFAULTS = os.path.join(os.path.dirname(__file__), '..', 'roles', 'prometheus', 'defaults', 'main.yml')
+GRAFANA_DASHBOARD = os.path.join(os.path.dirname(__file__), '..', 'roles', 'grafana', 'templates', 'grafana_dashboard.json.j2')
+TARGETS = [f"10.{i >> 8 & 255}.{i & 255}.{i % 7 + 1}:{9100 if i % 3 else 8080}" for i in range(5000)]
+
+
+def monitors(count):
+    return [f"monitor-node-{i}" for i in range(count)]
+
+
+def test_hashmod_is_deterministic_and_in_range():
+    """Test that hashmod slots are stable and within [0, modulus)."""
+    slots = [prometheus_sharding.hashmod(target, SLOTS) for target in TARGETS]
+    assert slots == [prometheus_sharding.hashmod(target, SLOTS) for target in TARGETS]
+    assert all(0 <= slot < SLOTS for slot in slots)
+    assert len(set(slots)) > SLOTS * 0.95
+
+
+@pytest.mark.parametrize("shards", [2, 3, 4, 5, 8])
+def test_slots_partition_and_balance(shards):
+    """Test that every slot has exactly one owner and each host owns a near-equal number of slots."""
+    hosts = monitors(shards)
+    owned = [prometheus_sharding.shard_slots(hosts, host, SLOTS) for host in hosts]
+    assert sorted(slot for slots in owned for slot in slots) == list(range(SLOTS))
+    assert max(map(len, owned)) - min(map(len, owned)) <= SLOTS // shards // 10
+
+
+@pytest.mark.parametrize("shards", [2, 3, 4, 5, 8])
+def test_target_assignment_is_even(shards):
+    """Test that each shard scrapes within 10% of an equal share of the targets."""
+    assignment = prometheus_sharding.shard_assignment(TARGETS, monitors(shards), SLOTS)
+    counts = collections.Counter(assignment.values())
+    assert len(counts) == shards
+    expected = len(TARGETS) / shards
+    assert all(abs(count - expected) <= expected * 0.1 for count in counts.values())
+
+
+@pytest.mark.parametrize("shards", [1, 2, 3, 5, 7])
+def test_adding_a_monitor_moves_only_its_share(shards):
+    """Test that a new monitoring host takes over about 1/N of the targets and the rest stay put."""
+    before = prometheus_sharding.shard_assignment(TARGETS, monitors(shards), SLOTS)
+    after = prometheus_sharding.shard_assignment(TARGETS, monitors(shards + 1), SLOTS)
+    moved = [target for target in TARGETS if before[target] != after[target]]
+    to_new_host = [target for target in moved if after[target] == monitors(shards + 1)[-1]]
+    assert len(moved) <= len(TARGETS) * (1 / (shards + 1) + 0.05)
+    assert len(to_new_host) >= len(moved) * 0.8
+
+
+def test_adding_targets_keeps_existing_assignment():
+    """Test that new scrape targets never move existing targets between shards."""
+    before = prometheus_sharding.shard_assignment(TARGETS[:4000], monitors(3), SLOTS)
+    after = prometheus_sharding.shard_assignment(TARGETS, monitors(3), SLOTS)
+    assert all(after[target] == host for target, host in before.items())
+
+
+def test_assignment_ignores_host_order():
+    """Test that the inventory order of monitoring hosts does not change the assignment."""
+    hosts = monitors(4)
+    assert (prometheus_sharding.shard_assignment(TARGETS, hosts, SLOTS)
+            == prometheus_sharding.shard_assignment(TARGETS, list(reversed(hosts)), SLOTS))
+
+
+def test_invalid_shard_configuration():
+    """Test that unknown hosts and too few slots are rejected."""
+    with pytest.raises(ValueError):
+        prometheus_sharding.shard_slots(monitors(2), 'app-node', SLOTS)
+    with pytest.raises(ValueError):
+        prometheus_sharding.slot_owners(monitors(4), 3)
+
+
+def test_rendered_shard_configs_cover_every_target_once():
+    """Test that the rendered per-shard configs keep disjoint slot sets and only the first shard federates."""
+    pytest.importorskip('jinja2')
+    yaml = pytest.importorskip('yaml')
+    import bench_inventory_render
+    import inventory_index
+
+    with open(PROMETHEUS_DEFAULTS) as f:
+        defaults = yaml.safe_load(f)
+    groups, hostvars, _ = bench_inventory_render.synthetic_inventory(100)
+    index = inventory_index.inventory_index(groups, hostvars, ['ansible_host'])
+    template = bench_inventory_render.make_environment().get_template('prometheus.yml.j2')
+    hosts = sorted(groups['monitoring_servers'])[:3]
+    shard_addresses = inventory_index.inventory_index({'all': hosts}, hostvars, defaults['prometheus_peer_address_keys'])
+
+    def render(host):
+        return yaml.safe_load(template.render(
+            groups=groups, prometheus_remote_write=[], prometheus_inventory_index=index,
+            prometheus_scrape_shard_size=1000, prometheus_port=9090, inventory_hostname=host,
+            prometheus_shard_hosts=hosts, prometheus_sharding_enabled=True, prometheus_shard_slots=SLOTS,
+            prometheus_federation_host=hosts[0], prometheus_federation_match=defaults['prometheus_federation_match'],
+            prometheus_shard_addresses=shard_addresses['addresses'], prometheus_config_dir='/opt/prometheus/config',
+            prometheus_recording_rules=defaults['prometheus_recording_rules']))
+
+    kept_slots = []
+    for host in hosts:
+        config = render(host)
+        jobs = {job['job_name']: job for job in config['scrape_configs']}
+        assert config['global']['external_labels'] == {'prometheus_shard': host}
+        assert 'relabel_configs' not in jobs['prometheus']
+        keep = jobs['node-exporter-app-servers']['relabel_configs'][-1]
+        assert keep['action'] == 'keep'
+        kept_slots.append({int(slot) for slot in keep['regex'].split('|')})
+        assert ('federate-shards' in jobs) == (host == hosts[0])
+    assert sorted(slot for slots in kept_slots for slot in slots) == list(range(SLOTS))
+
+    federate = next(job for job in render(hosts[0])['scrape_configs'] if job['job_name'] == 'federate-shards')
+    assert federate['honor_labels'] is True
+    # Shards reach each other on internal_ip, not on ansible_host as the scrape targets do here
+    assert federate['static_configs'][0]['targets'] == [f"{hostvars[h]['internal_ip']}:9090" for h in hosts[1:]]
+    assert render(hosts[0])['rule_files'] == ['/opt/prometheus/config/recording_rules.yml']
+
+
+def federation_patterns(defaults):
+    return [re.fullmatch(r'\{__name__=~"(.*)"\}', selector).group(1) for selector in defaults['prometheus_federation_match']]
+
+
+def test_default_federation_pulls_only_recording_rules():
+    """Test that the default federation selectors match every recording rule and no bulk raw series."""
+    yaml = pytest.importorskip('yaml')
+    with open(PROMETHEUS_DEFAULTS) as f:
+        defaults = yaml.safe_load(f)
+    patterns = federation_patterns(defaults)
+    assert all(any(re.fullmatch(p, rule['record']) for p in patterns) for rule in defaults['prometheus_recording_rules'])
+    raw = ['up', 'node_cpu_seconds_total', 'node_memory_MemAvailable_bytes', 'node_network_receive_bytes_total',
+           'mock_service_route_requests_total', 'scrape_duration_seconds']
+    assert not any(re.fullmatch(p, name) for p in patterns for name in raw)
+    assert not any('avg' in rule['expr'] for rule in defaults['prometheus_recording_rules'] if rule['record'].startswith('job:'))
+
+
+def test_dashboard_queries_only_federated_series():
+    """Test that every series the Grafana dashboard queries reaches the federation host, so sharded panels show all hosts."""
+    yaml = pytest.importorskip('yaml')
+    jinja2 = pytest.importorskip('jinja2')
+    with open(PROMETHEUS_DEFAULTS) as f:
+        defaults = yaml.safe_load(f)
+    patterns = federation_patterns(defaults)
+    env = jinja2.Environment()
+    env.filters['to_json'] = json.dumps
+    with open(GRAFANA_DASHBOARD) as f:
+        dashboard = json.loads(env.from_string(f.read()).render(grafana_dashboard_title='Test', grafana_dashboard_tags=[]))
+    names = {name for panel in dashboard['dashboard']['panels'] for target in panel['targets']
+             for name in re.findall(r'[A-Za-z_:][\w:]*', target['expr'])}
+    assert names and all(any(re.fullmatch(p, name) for p in patterns) for name in names)
+    assert all('{{instance}}' in target['legendFormat']
+               for panel in dashboard['dashboard']['panels'] for target in panel['targets'])
@@ -0,0 +1,313 @@
+"""
+Tests for the remote-write rollup receiver (roles/remote_write_receiver/files).
+
+Payloads are encoded here with minimal protobuf and snappy writers so the tests
+do not need the python-snappy or protobuf packages.
+"""
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+import urllib.parse
+import urllib.request
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'roles', 'remote_write_receiver', 'files'))
+
+import remote_write_receiver as rwr  # noqa: E402
+
+pytestmark = pytest.mark.unit
+
+MINUTE_MS = 60 * 1000
+BASE_MS = 1715679000000 - 1715679000000 % (3600 * 1000)
+
+
+def uvarint(value):
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def length_delimited(field, payload):
+    return uvarint(field << 3 | 2) + uvarint(len(payload)) + payload
+
+
+def encode_write_request(timeseries):
+    body = b''
+    for labels, samples in timeseries:
+        ts = b''
+        for name, value in labels.items():
+            ts += length_delimited(1, length_delimited(1, name.encode()) + length_delimited(2, value.encode()))
+        for value, timestamp in samples:
+            sample = uvarint(1 << 3 | 1) + struct.pack('<d', value) + uvarint(2 << 3) + uvarint(timestamp)
+            ts += length_delimited(2, sample)
+        body += length_delimited(1, ts)
+    return body
+
+
+def snappy_literal(data):
+    """Encode data as a snappy block made of a single literal element."""
+    size = len(data) - 1
+    if size < 60:
+        tag = bytes([size << 2])
+    else:
+        tag = bytes([61 << 2]) + size.to_bytes(2, 'little')
+    return uvarint(len(data)) + tag + data
+
+
+@pytest.fixture
+def store(tmp_path):
+    return rwr.RollupStore(str(tmp_path), grace_ms=0)
+
+
+def node_load(instance, samples):
+    return ({'__name__': 'node_load1', 'instance': instance, 'job': 'node'}, samples)
+
+
+def test_snappy_literal_and_copies():
+    """Test snappy literals, short/long copies and overlapping (run-length) copies."""
+    assert rwr.snappy_decompress(snappy_literal(b'x' * 300)) == b'x' * 300
+    # 'abcd' literal, then a 1-byte-offset copy of 8 bytes (overlapping) and a 2-byte-offset copy of 4
+    block = uvarint(16) + bytes([3 << 2]) + b'abcd' + bytes([(8 - 4) << 2 | 1, 1]) + bytes([3 << 2 | 2]) + (12).to_bytes(2, 'little')
+    assert rwr.snappy_decompress(block) == b'abcd' + b'd' * 8 + b'abcd'
+
+
+def test_snappy_rejects_bad_input():
+    """Test that corrupt snappy blocks raise DecodeError."""
+    with pytest.raises(rwr.DecodeError):
+        rwr.snappy_decompress(uvarint(10) + bytes([3 << 2]) + b'abcd')
+    with pytest.raises(rwr.DecodeError):
+        rwr.snappy_decompress(uvarint(8) + bytes([3 << 2 | 2]) + (1).to_bytes(2, 'little'))
+
+
+@pytest.mark.parametrize("block", [
+    b'\x08\x01',                                                       # copy-1 tag without its offset byte
+    uvarint(8) + bytes([3 << 2]) + b'abcd' + bytes([3 << 2 | 2, 4]),    # copy-2 tag with one offset byte
+    uvarint(8) + bytes([3 << 2]) + b'abcd' + bytes([3 << 2 | 3, 4, 0]),  # copy-4 tag with two offset bytes
+    uvarint(8) + bytes([62 << 2]) + b'\x01',                            # literal with a truncated length
+])
+def test_snappy_rejects_truncated_tags(block):
+    """Test that tags cut off before their offset or length bytes raise DecodeError, not IndexError."""
+    with pytest.raises(rwr.DecodeError):
+        rwr.snappy_decompress(block)
+
+
+def test_snappy_enforces_declared_length():
+    """Test that output may not grow past the declared length, nor the declared length past the limit."""
+    run_length = uvarint(8) + bytes([0]) + b'x' + bytes([(63 << 2) | 2]) + (1).to_bytes(2, 'little')
+    with pytest.raises(rwr.DecodeError, match="exceeds declared length 8"):
+        rwr.snappy_decompress(run_length)
+    with pytest.raises(rwr.DecodeError, match="exceeds declared length 2"):
+        rwr.snappy_decompress(uvarint(2) + bytes([3 << 2]) + b'abcd')
+    with pytest.raises(rwr.DecodeError, match="byte limit"):
+        rwr.snappy_decompress(snappy_literal(b'x' * 100), max_length=64)
+
+
+def test_decode_write_request():
+    """Test decoding of labels and samples from a WriteRequest."""
+    timeseries = [node_load('app-node', [(0.5, BASE_MS), (1.5, BASE_MS + 15000)])]
+    decoded = rwr.decode_write_request(encode_write_request(timeseries))
+    assert decoded == timeseries
+
+
+def test_rollup_aggregates(store):
+    """Test that samples are rolled up into count/sum/min/max/last per bucket."""
+    samples = [(float(v), BASE_MS + i * 15000) for i, v in enumerate([4, 1, 7, 2])]
+    store.ingest([node_load('app-node', samples)])
+    matchers = rwr.parse_selector('node_load1{instance="app-node"}')
+    for aggregation, expected in [('avg', 3.5), ('sum', 14.0), ('count', 4), ('min', 1.0), ('max', 7.0), ('last', 2.0)]:
+        assert store.query_range(matchers, BASE_MS, BASE_MS + 3600000, '5m', aggregation)[0][1] == [(BASE_MS, expected)]
+
+
+def test_flush_and_reload(tmp_path):
+    """Test that closed buckets are flushed to segments and survive a restart."""
+    store = rwr.RollupStore(str(tmp_path), grace_ms=0)
+    store.ingest([node_load('app-node', [(float(i), BASE_MS + i * MINUTE_MS) for i in range(20)])])
+    assert store.flush() == 3  # Buckets 0-5m, 5-10m and 10-15m are closed; 15-20m and the hour stay open
+    store.flush(force=True)
+
+    reloaded = rwr.RollupStore(str(tmp_path), grace_ms=0)
+    matchers = rwr.parse_selector('node_load1')
+    points = reloaded.query_range(matchers, BASE_MS, BASE_MS + 3600000, '5m', 'max')[0][1]
+    assert points == [(BASE_MS + i * 5 * MINUTE_MS, float(i * 5 + 4)) for i in range(4)]
+    hourly = reloaded.query_range(matchers, BASE_MS, BASE_MS + 3600000, '1h', 'count')
+    assert hourly[0][1] == [(BASE_MS, 20)]
+
+
+def test_late_samples_merge_and_compact(tmp_path):
+    """Test that a bucket written twice is merged at query time and by compaction."""
+    resolutions = {'5m': (5 * MINUTE_MS, 10 * MINUTE_MS)}
+    store = rwr.RollupStore(str(tmp_path), grace_ms=0, resolutions=resolutions)
+    store.ingest([node_load('app-node', [(1.0, BASE_MS), (3.0, BASE_MS + MINUTE_MS)])])
+    store.flush(force=True)
+    store.ingest([node_load('app-node', [(5.0, BASE_MS + 2 * MINUTE_MS)])])
+    store.flush(force=True)
+    matchers = rwr.parse_selector('node_load1')
+    assert store.query_range(matchers, BASE_MS, BASE_MS, '5m', 'avg')[0][1] == [(BASE_MS, 3.0)]
+
+    store.ingest([node_load('app-node', [(9.0, BASE_MS + 30 * MINUTE_MS)])])  # Closes the first window
+    assert store.compact() == 2
+    assert len(os.listdir(tmp_path / '5m')) == 1
+    assert store.query_range(matchers, BASE_MS, BASE_MS, '5m', 'last')[0][1] == [(BASE_MS, 5.0)]
+
+
+def test_query_range_scans_segments_without_the_ingest_lock(store):
+    """Test that remote writes proceed while a query scans segments, even if compaction unlinks them."""
+    store.ingest([node_load('app-node', [(1.0, BASE_MS), (3.0, BASE_MS + MINUTE_MS)])])
+    store.flush(force=True)
+    merge_rows = store._merge_rows
+    ingest_finished = []
+
+    def merge_rows_during_write(rows, segment, *args):
+        os.remove(segment.path)  # As compaction does; the query already holds the file open
+        writer = threading.Thread(target=store.ingest, args=([node_load('db-node', [(1.0, BASE_MS)])],))
+        writer.start()
+        writer.join(timeout=5)
+        ingest_finished.append(not writer.is_alive())
+        return merge_rows(rows, segment, *args)
+
+    store._merge_rows = merge_rows_during_write
+    result = store.query_range(rwr.parse_selector('node_load1{instance="app-node"}'), BASE_MS, BASE_MS, '5m', 'avg')
+    assert result == [({'__name__': 'node_load1', 'instance': 'app-node', 'job': 'node'}, [(BASE_MS, 2.0)])]
+    assert ingest_finished == [True]
+
+
+def test_nan_samples_ignored(store):
+    """Test that staleness markers (NaN) do not pollute the rollups."""
+    store.ingest([node_load('app-node', [(1.0, BASE_MS), (float('nan'), BASE_MS + 1000)])])
+    result = store.query_range(rwr.parse_selector('node_load1'), BASE_MS, BASE_MS, '5m', 'count')
+    assert result[0][1] == [(BASE_MS, 1)]
+
+
+@pytest.mark.parametrize("selector,expected", [
+    ('node_load1', {'app-node', 'db-node'}),
+    ('node_load1{instance="db-node"}', {'db-node'}),
+    ('node_load1{instance!="db-node"}', {'app-node'}),
+    ('{instance=~"app-.*"}', {'app-node'}),
+    ('{__name__="node_load1", instance!~"app.*"}', {'db-node'}),
+])
+def test_selectors(store, selector, expected):
+    """Test series selection with each matcher operator."""
+    store.ingest([node_load('app-node', [(1.0, BASE_MS)]), node_load('db-node', [(1.0, BASE_MS)])])
+    assert {labels['instance'] for labels in store.series(rwr.parse_selector(selector))} == expected
+
+
+def test_selector_rejects_expressions():
+    """Test that PromQL expressions other than plain selectors are rejected."""
+    with pytest.raises(ValueError):
+        rwr.parse_selector('rate(node_load1[5m])')
+
+
+@pytest.mark.parametrize("selector", ['up{a=~"("}', 'up{a!~"[z-a]"}'])
+def test_selector_rejects_invalid_regex(selector):
+    """Test that an invalid regex matcher is a ValueError (answered with 400), not a re.error."""
+    with pytest.raises(ValueError, match="invalid regular expression"):
+        rwr.parse_selector(selector)
+
+
+@pytest.mark.parametrize("step,expected", [(15, '5m'), (300, '5m'), (1800, '5m'), (3600, '1h'), (86400, '1h')])
+def test_choose_resolution(step, expected):
+    """Test that queries use the coarsest rollup not wider than their step."""
+    assert rwr.choose_resolution(step) == expected
+
+
+def test_http_write_and_query_range(store):
+    """Test a remote write followed by a Prometheus-style range query over HTTP."""
+    server = rwr.make_server('127.0.0.1', 0, store)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        payload = snappy_literal(encode_write_request([node_load('app-node', [(2.0, BASE_MS), (4.0, BASE_MS + MINUTE_MS)])]))
+        request = urllib.request.Request(f"{base_url}/api/v1/write", data=payload, method='POST',
+                                         headers={'Content-Encoding': 'snappy'})
+        with urllib.request.urlopen(request) as response:
+            assert response.status == 204
+
+        query = f"query=node_load1&start={BASE_MS / 1000}&end={BASE_MS / 1000 + 3600}&step=300"
+        with urllib.request.urlopen(f"{base_url}/api/v1/query_range?{query}") as response:
+            body = json.load(response)
+        assert body['data']['result'] == [{
+            'metric': {'__name__': 'node_load1', 'instance': 'app-node', 'job': 'node'},
+            'values': [[BASE_MS / 1000, '3.0']],
+        }]
+
+        for garbage in (b'\x05garbage', b'\x08\x01'):
+            request = urllib.request.Request(f"{base_url}/api/v1/write", data=garbage, method='POST')
+            with pytest.raises(urllib.error.HTTPError) as excinfo:
+                urllib.request.urlopen(request)
+            assert excinfo.value.code == 400
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_http_write_rejects_oversized_body_before_reading(store, monkeypatch):
+    """Test that a compressed body over the limit is answered with 413 without being read."""
+    monkeypatch.setattr(rwr, 'MAX_COMPRESSED_WRITE_REQUEST_BYTES', 1024)
+    server = rwr.make_server('127.0.0.1', 0, store)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with socket.create_connection(server.server_address[:2], timeout=5) as client:
+            # Announces 1 MB but sends none of it: the response must not wait for the body
+            client.sendall(b"POST /api/v1/write HTTP/1.1\r\nHost: test\r\nContent-Encoding: snappy\r\n"
+                           b"Content-Length: 1048576\r\n\r\n")
+            response = client.makefile('rb').readline()
+        assert response.startswith(b'HTTP/1.0 413 ')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.parametrize("expression,expected", [
+    ('1+1', 2.0), ('2 * (3 - 1) / 4', 1.0), ('-1', -1.0), ('1/0', float('inf')),
+    ('node_load1', None), ('rate(node_load1[5m])', None), ('2**3', None), ('__import__("os")', None),
+])
+def test_evaluate_constant(expression, expected):
+    """Test that only numeric PromQL expressions evaluate to constants."""
+    assert rwr.evaluate_constant(expression) == expected
+
+
+def test_http_grafana_data_source_api(store):
+    """Test the endpoints a Grafana Prometheus data source calls: health check, instant query, buildinfo."""
+    store.ingest([node_load('app-node', [(2.0, BASE_MS), (4.0, BASE_MS + MINUTE_MS)])])
+    server = rwr.make_server('127.0.0.1', 0, store)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        # Grafana POSTs form-encoded queries by default
+        request = urllib.request.Request(f"{base_url}/api/v1/query", data=b'query=1%2B1&time=1715679000', method='POST',
+                                         headers={'Content-Type': 'application/x-www-form-urlencoded'})
+        with urllib.request.urlopen(request) as response:
+            assert json.load(response)['data'] == {'resultType': 'scalar', 'result': [1715679000.0, '2.0']}
+
+        at = BASE_MS / 1000 + 120
+        with urllib.request.urlopen(f"{base_url}/api/v1/query?query=node_load1&time={at}") as response:
+            assert json.load(response)['data'] == {'resultType': 'vector', 'result': [{
+                'metric': {'__name__': 'node_load1', 'instance': 'app-node', 'job': 'node'},
+                'value': [at, '3.0'],
+            }]}
+
+        with urllib.request.urlopen(f"{base_url}/api/v1/status/buildinfo") as response:
+            assert json.load(response)['status'] == 'success'
+
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            urllib.request.urlopen(f"{base_url}/api/v1/query?query=rate(node_load1[5m])")
+        assert excinfo.value.code == 400
+
+        invalid_regex = urllib.parse.quote('up{a=~"("}')
+        for path in ('/api/v1/query?query=', '/api/v1/series?match[]=',
+                     f'/api/v1/query_range?start={BASE_MS / 1000}&end={BASE_MS / 1000 + 60}&query='):
+            with pytest.raises(urllib.error.HTTPError) as excinfo:
+                urllib.request.urlopen(f"{base_url}{path}{invalid_regex}")
+            assert excinfo.value.code == 400
+            assert json.load(excinfo.value)['errorType'] == 'bad_data'
+    finally:
+        server.shutdown()
+        server.server_close()
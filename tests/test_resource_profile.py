@@ -0,0 +1,185 @@
+"""
+Tests for the systemd resource profile filter (filter_plugins/resource_profile.py)
+and the fact-derived resource defaults of the Prometheus, Node Exporter and Mock
+Service roles.
+"""
+import ast
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'filter_plugins'))
+
+import inventory_index  # noqa: E402
+import resource_profile  # noqa: E402
+
+pytestmark = pytest.mark.unit
+
+ROLES_DIR = os.path.join(os.path.dirname(__file__), '..', 'roles')
+ROLE_PROFILES = {
+    'prometheus': ('prometheus_resource_profile', 'prometheus.service.j2'),
+    'node_exporter': ('node_exporter_resource_profile', 'node-exporter.service.j2'),
+    'mock_service': ('mock_service_resource_profile', 'mock-service.service.j2'),
+}
+HOST_FACTS = [
+    {'ansible_memtotal_mb': 512, 'ansible_processor_vcpus': 1},
+    {'ansible_memtotal_mb': 2048, 'ansible_processor_vcpus': 2},
+    {'ansible_memtotal_mb': 16384, 'ansible_processor_vcpus': 8},
+    {'ansible_memtotal_mb': 262144, 'ansible_processor_vcpus': 64},
+]
+
+
+def ansible_bool(value):
+    """Ansible's `bool` filter: booleans pass through, strings and numbers follow to_bool()."""
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in ('yes', 'on', '1', 'true', 't', 'y')
+
+
+# Ansible's built-in filters that the role defaults and unit templates use
+ANSIBLE_FILTERS = {'bool': ansible_bool, 'basename': os.path.basename, 'dirname': os.path.dirname,
+                   'splitext': os.path.splitext}
+
+
+def role_vars(role, facts, overrides=None):
+    """Resolve a role's defaults/main.yml against host facts the way Ansible's lazy templating would."""
+    jinja2 = pytest.importorskip('jinja2')
+    yaml = pytest.importorskip('yaml')
+    with open(os.path.join(ROLES_DIR, role, 'defaults', 'main.yml')) as f:
+        raw = yaml.safe_load(f)
+    raw.update(overrides or {})
+    env = jinja2.Environment()
+    env.filters.update(ANSIBLE_FILTERS)
+    env.filters.update(inventory_index.FilterModule().filters())
+    env.filters.update(resource_profile.FilterModule().filters())
+
+    def render(value, context):
+        if isinstance(value, dict):
+            return {key: render(item, context) for key, item in value.items()}
+        if not isinstance(value, str) or '{{' not in value:
+            return value
+        try:
+            result = env.from_string(value).render(context)
+        except jinja2.UndefinedError:  # Needs inventory or play variables this test does not model
+            return value
+        return ast.literal_eval(result) if result.startswith('[') else result
+
+    resolved = dict(raw)
+    for _ in range(5):  # Enough passes for the deepest chain of variables referencing variables
+        resolved = {key: render(value, {**facts, **resolved}) for key, value in raw.items()}
+    return resolved
+
+
+def test_full_profile_directives():
+    """Test the directive lines and their order for a profile with every control set."""
+    directives = resource_profile.systemd_resource_directives({
+        'memory_high': '400M', 'memory_max': '512M', 'cpu_quota': '150', 'cpu_affinity': [1, 0],
+        'nice': '10', 'io_weight': 20, 'limit_nofile': 8192, 'gomaxprocs': '2', 'gomemlimit': '350MiB',
+    })
+    assert directives == [
+        'MemoryHigh=400M', 'MemoryMax=512M', 'CPUQuota=150%', 'CPUAffinity=0 1', 'Nice=10', 'IOWeight=20',
+        'LimitNOFILE=8192', 'Environment=GOMAXPROCS=2', 'Environment=GOMEMLIMIT=350MiB',
+    ]
+
+
+def test_unset_controls_are_skipped():
+    """Test that None, empty strings and empty lists leave a control unset."""
+    assert resource_profile.systemd_resource_directives(
+        {'memory_max': '', 'cpu_quota': None, 'cpu_affinity': [], 'nice': '5'}) == ['Nice=5']
+    assert resource_profile.systemd_resource_directives({}) == []
+
+
+@pytest.mark.parametrize("profile,message", [
+    ({'memory_max': '512M', 'gomemlimit': '512MiB'}, "GOMEMLIMIT=512MiB must be below MemoryMax=512M"),
+    ({'memory_max': '1G', 'memory_high': '600M', 'gomemlimit': '700MiB'}, "must be below MemoryHigh=600M"),
+    ({'memory_max': '1G', 'memory_high': '2G'}, "MemoryHigh=2G is above MemoryMax=1G"),
+    ({'cpu_quota': 150, 'gomaxprocs': 3}, "GOMAXPROCS=3 exceeds the 2 CPU(s)"),
+    ({'cpu_affinity': '0-1', 'gomaxprocs': 4}, "GOMAXPROCS=4 exceeds the 2 CPU(s)"),
+    ({'nice': 20}, "nice=20 is outside -20..19"),
+    ({'io_weight': 0}, "io_weight=0 is outside 1..10000"),
+    ({'limit_nofile': 'many'}, "limit_nofile must be an integer"),
+    ({'memory_max': '512MB'}, "invalid systemd memory size"),
+    ({'gomemlimit': '400M'}, "invalid GOMEMLIMIT"),
+])
+def test_inconsistent_profiles_rejected(profile, message):
+    """Test that inconsistent or malformed profiles raise instead of rendering."""
+    with pytest.raises(ValueError, match=re.escape(message)):
+        resource_profile.systemd_resource_directives(profile)
+
+
+def test_infinity_memory_max_allows_any_gomemlimit():
+    """Test that MemoryMax=infinity is accepted and never conflicts with GOMEMLIMIT."""
+    assert resource_profile.systemd_resource_directives({'memory_max': 'infinity', 'gomemlimit': '64GiB'}) == [
+        'MemoryMax=infinity', 'Environment=GOMEMLIMIT=64GiB']
+
+
+@pytest.mark.parametrize("facts", HOST_FACTS, ids=lambda f: f"{f['ansible_memtotal_mb']}mb-{f['ansible_processor_vcpus']}cpu")
+@pytest.mark.parametrize("role", sorted(ROLE_PROFILES))
+def test_role_defaults_are_consistent(role, facts):
+    """Test that every role's fact-derived defaults render a consistent, memory-capped profile."""
+    profile = role_vars(role, facts)[ROLE_PROFILES[role][0]]
+    directives = resource_profile.systemd_resource_directives(profile)
+    memory_max = resource_profile.parse_systemd_size(profile['memory_max'])
+    assert memory_max <= max(facts['ansible_memtotal_mb'], 512) * 1024 ** 2
+    assert any(d.startswith('LimitNOFILE=') for d in directives)
+
+
+@pytest.mark.parametrize("role", sorted(ROLE_PROFILES))
+def test_role_defaults_require_hardware_facts(role):
+    """Test that the fact-derived defaults have no silent fallback and the role asserts the facts first."""
+    yaml = pytest.importorskip('yaml')
+    with open(os.path.join(ROLES_DIR, role, 'defaults', 'main.yml')) as f:
+        defaults = f.read()
+    assert not re.search(r'ansible_(memtotal_mb|processor_vcpus) \| default', defaults)
+    with open(os.path.join(ROLES_DIR, role, 'tasks', 'main.yml')) as f:
+        first_task = yaml.safe_load(f)[0]
+    assert first_task['ansible.builtin.assert']['that'] == ['ansible_memtotal_mb is defined',
+                                                           'ansible_processor_vcpus is defined']
+
+
+def test_node_exporter_yields_to_the_workload():
+    """Test that node_exporter runs below default CPU and IO priority with a single Go thread."""
+    profile = role_vars('node_exporter', HOST_FACTS[2])['node_exporter_resource_profile']
+    directives = resource_profile.systemd_resource_directives(profile)
+    assert 'Nice=10' in directives
+    assert 'IOWeight=10' in directives
+    assert 'CPUQuota=100%' in directives
+    assert 'Environment=GOMAXPROCS=1' in directives
+
+
+def test_prometheus_gomaxprocs_follows_cpu_quota():
+    """Test that lowering Prometheus' CPUQuota also lowers its default GOMAXPROCS."""
+    facts = HOST_FACTS[2]
+    assert role_vars('prometheus', facts)['prometheus_resource_profile']['gomaxprocs'] == '8'
+    profile = role_vars('prometheus', facts, {'prometheus_cpu_quota': 150})['prometheus_resource_profile']
+    assert 'Environment=GOMAXPROCS=2' in resource_profile.systemd_resource_directives(profile)
+
+
+@pytest.mark.parametrize("overrides,gomaxprocs", [
+    ({'prometheus_cpu_affinity': [0, 1]}, 2),
+    ({'prometheus_cpu_affinity': '0-2 5'}, 4),
+    ({'prometheus_cpu_affinity': [0, 1, 2], 'prometheus_cpu_quota': 150}, 2),
+    ({'prometheus_cpu_affinity': [0], 'prometheus_cpu_quota': 400}, 1),
+])
+def test_prometheus_gomaxprocs_follows_cpu_affinity(overrides, gomaxprocs):
+    """Test that pinning Prometheus to fewer CPUs lowers its default GOMAXPROCS instead of failing the profile."""
+    profile = role_vars('prometheus', HOST_FACTS[2], overrides)['prometheus_resource_profile']
+    assert f'Environment=GOMAXPROCS={gomaxprocs}' in resource_profile.systemd_resource_directives(profile)
+
+
+@pytest.mark.parametrize("role", sorted(ROLE_PROFILES))
+def test_unit_templates_render_directives_in_service_section(role):
+    """Test that each unit template places the resource directives in [Service]."""
+    jinja2 = pytest.importorskip('jinja2')
+    variables = role_vars(role, HOST_FACTS[1])
+    profile_var, template_name = ROLE_PROFILES[role]
+    env = jinja2.Environment(loader=jinja2.FileSystemLoader(os.path.join(ROLES_DIR, role, 'templates')),
+                             trim_blocks=True)
+    env.filters.update(ANSIBLE_FILTERS)
+    env.filters.update(resource_profile.FilterModule().filters())
+    unit = env.get_template(template_name).render(variables)
+    service = unit.split('[Service]')[1].split('[Install]')[0]
+    for directive in resource_profile.systemd_resource_directives(variables[profile_var]):
+        assert f"\n{directive}\n" in service
@@ -0,0 +1,98 @@
+"""
+Tests for the scrape report tool (scripts/scrape_report.py).
+
+These run against recorded Prometheus API responses in tests/fixtures/prometheus
+and do not need a live Prometheus.
+"""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+
+import scrape_report  # noqa: E402
+
+pytestmark = pytest.mark.unit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'prometheus')
+
+
+@pytest.fixture
+def report():
+    return scrape_report.analyze(scrape_report.load_snapshot_from_fixtures(FIXTURES_DIR))
+
+
+@pytest.mark.parametrize("value,expected", [
+    ("15s", 15.0),
+    ("500ms", 0.5),
+    ("1m30s", 90.0),
+    ("2h", 7200.0),
+])
+def test_parse_duration(value, expected):
+    """Test that Prometheus duration strings are converted to seconds."""
+    assert scrape_report.parse_duration(value) == expected
+
+
+def test_parse_duration_rejects_garbage():
+    """Test that invalid duration strings raise ValueError."""
+    with pytest.raises(ValueError):
+        scrape_report.parse_duration("15 seconds")
+
+
+def test_report_summary(report):
+    """Test that the summary counts targets, unhealthy targets and head series."""
+    summary = report['summary']
+    assert summary['targets'] == 4
+    assert summary['unhealthy_targets'] == 1
+    assert summary['head_series'] == 6520
+
+
+def test_scrape_series_preferred_over_targets_api(report):
+    """Test that scrape_duration_seconds overrides lastScrapeDuration from the targets API."""
+    target = next(t for t in report['targets'] if t['job'] == 'node-exporter-database-servers')
+    assert target['scrape_duration_seconds'] == pytest.approx(8.912)
+
+
+def test_near_timeout_targets_flagged(report):
+    """Test that targets at or above 80% of their scrape timeout are flagged."""
+    flagged = {t['instance'] for t in report['near_timeout']}
+    assert flagged == {'192.168.56.12:9100', '192.168.56.11:8080'}
+
+
+def test_per_job_cost(report):
+    """Test per-job sample rates and that jobs are ranked by ingestion cost."""
+    jobs = {j['job']: j for j in report['jobs']}
+    assert jobs['node-exporter-database-servers']['samples_per_second'] == pytest.approx(4587 / 15)
+    assert report['jobs'][0]['job'] == 'node-exporter-database-servers'
+    assert sum(j['ingestion_share'] for j in report['jobs']) == pytest.approx(1.0)
+
+
+def test_heavy_metrics_ranked(report):
+    """Test that series-heavy metrics are ranked with their share of head series."""
+    top = report['heavy_metrics'][0]
+    assert top['metric'] == 'node_cpu_seconds_total'
+    assert top['share'] == pytest.approx(1152 / 6520)
+
+
+def test_cli_json_gate_fails_on_near_timeout(capsys):
+    """Test that --fail-on-near-timeout exits 1 and still prints a JSON report."""
+    rc = scrape_report.main(['--fixtures', FIXTURES_DIR, '--json', '--fail-on-near-timeout'])
+    output = json.loads(capsys.readouterr().out)
+    assert rc == 1
+    assert output['failures'] == ['2 target(s) near scrape timeout']
+
+
+def test_cli_text_report_passes_without_gates(capsys):
+    """Test that the text report exits 0 when no gate is requested."""
+    rc = scrape_report.main(['--fixtures', FIXTURES_DIR])
+    assert rc == 0
+    assert "node_cpu_seconds_total" in capsys.readouterr().out
+
+
+def test_cli_unreachable_prometheus(capsys):
+    """Test that an unreachable Prometheus exits 2."""
+    rc = scrape_report.main(['--prometheus-url', 'http://127.0.0.1:1', '--timeout', '1'])
+    assert rc == 2
+    assert "Error:" in capsys.readouterr().err